@@ -1,48 +1,47 @@
-import re
+import argparse
 import numpy as np
-from scipy.optimize import milp, LinearConstraint, Bounds
+
+import asm_ir
 
 def find_merge_opportunities(asm_file):
-    # Regex for ARM64 instructions: addr: hex mnemonic operands
-    # Example: 10003d624: a9ba6ffc     stp     x28, x27, [sp, #-0x60]!
-    # Example: 10003d6a4: f940e3e8     ldr     x8, [sp, #0x1c0]
-    inst_re = re.compile(r'^\s*[0-9a-f]+:\s+[0-9a-f]+\s+(\w+)\s+(.*)$')
-    
-    instructions = []
-    with open(asm_file, 'r') as f:
-        for line in f:
-            m = inst_re.match(line)
-            if m:
-                instructions.append({'op': m.group(1), 'args': m.group(2)})
+    program = asm_ir.load(asm_file)
+    candidates, reduction = program.find_merges()
+    return len(program), candidates, reduction
+
+def conflict_pairs(candidates):
+    # With candidates sorted by start index only neighbours can overlap,
+    # so the conflict list is built in one linear pass
+    return [(j, j + 1) for j in range(len(candidates) - 1)
+            if candidates[j + 1][0] <= candidates[j][1]]
 
-    candidates = []
-    # Heuristic: Look for consecutive LDR or STR instructions to the same base register with adjacent offsets
-    # This is a classic pattern for LDP/STP (Load/Store Pair) merging.
-    for i in range(len(instructions) - 1):
-        inst1 = instructions[i]
-        inst2 = instructions[i+1]
-        
-        if inst1['op'] == inst2['op'] and inst1['op'] in ['ldr', 'str']:
-            # Simplified parsing: look for [reg, #offset]
-            # args example: x8, [sp, #0x1c0]
-            m1 = re.search(r'(\w+),\s+\[(\w+)(?:,\s+#(-?0x[0-9a-f]+|[0-9]+))?\]', inst1['args'])
-            m2 = re.search(r'(\w+),\s+\[(\w+)(?:,\s+#(-?0x[0-9a-f]+|[0-9]+))?\]', inst2['args'])
-            
-            if m1 and m2:
-                reg1, base1, off1 = m1.groups()
-                reg2, base2, off2 = m2.groups()
-                
-                if base1 == base2:
-                    # Potential merge if they are adjacent
-                    # (This is a simplified check for the MILP demonstration)
-                    candidates.append((i, i+1))
+def solve_cpsat_check(candidates):
+    # Cross-check the greedy result with OR-Tools CP-SAT, which handles
+    # pure binary selection problems far better than a MILP solver
+    from ortools.sat.python import cp_model
 
-    return len(instructions), candidates
+    candidates = sorted(candidates)
+    model = cp_model.CpModel()
+    x = [model.NewBoolVar(f'x{i}') for i in range(len(candidates))]
+    for j, k in conflict_pairs(candidates):
+        model.Add(x[j] + x[k] <= 1)
+    model.Maximize(sum(x))
+
+    solver = cp_model.CpSolver()
+    solver.parameters.num_workers = 8
+    status = solver.Solve(model)
+    if status in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+        return int(solver.ObjectiveValue())
+    return 0
+
+def solve_milp_check(candidates):
+    # Cross-check the greedy result with the explicit MILP formulation
+    from scipy.optimize import milp, LinearConstraint, Bounds
+    from scipy.sparse import csr_matrix
 
-def solve_milp_reduction(total_instr, candidates):
     if not candidates:
         return 0
 
+    candidates = sorted(candidates)
     num_vars = len(candidates)
     
     # Objective: Maximize reduction (each chosen merge reduces instruction count by 1)
@@ -51,27 +50,20 @@ def solve_milp_reduction(total_instr, candidates):
     
     # Constraints: No instruction can be part of two merges
     # If candidate j merges (i, i+1) and candidate k merges (i+1, i+2), they conflict.
+    # Each row x_j + x_k <= 1 has exactly two nonzeros, so the matrix is
+    # assembled directly in CSR form
+    conflicts = np.array(conflict_pairs(candidates), dtype=np.int64).reshape(-1, 2)
+    num_conflicts = len(conflicts)
     
-    # Build conflict matrix
-    constraints = []
-    for j in range(num_vars):
-        for k in range(j + 1, num_vars):
-            set_j = set(candidates[j])
-            set_k = set(candidates[k])
-            if set_j.intersection(set_k):
-                # Conflict! x_j + x_k <= 1
-                row = np.zeros(num_vars)
-                row[j] = 1
-                row[k] = 1
-                constraints.append(row)
-    
-    if not constraints:
+    if num_conflicts == 0:
         # No conflicts, all can be merged
         return num_vars
 
-    A = np.array(constraints)
-    b_u = np.ones(len(constraints))
-    b_l = np.full(len(constraints), -np.inf)
+    A = csr_matrix((np.ones(2 * num_conflicts), conflicts.ravel(),
+                    np.arange(0, 2 * num_conflicts + 1, 2)),
+                   shape=(num_conflicts, num_vars))
+    b_u = np.ones(num_conflicts)
+    b_l = np.full(num_conflicts, -np.inf)
     
     # All variables are binary (0 or 1)
     integrality = np.ones(num_vars) 
@@ -85,9 +77,13 @@ def solve_milp_reduction(total_instr, candidates):
     return 0
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Estimate LDP/STP merge opportunities")
+    parser.add_argument("--validate", action="store_true",
+                        help="Cross-check the greedy optimum with CP-SAT (or scipy's MILP solver without OR-Tools)")
+    args = parser.parse_args()
+
     asm_file = 'build/hfdown_full.asm'
-    total, candidates = find_merge_opportunities(asm_file)
-    reduction = solve_milp_reduction(total, candidates)
+    total, candidates, reduction = find_merge_opportunities(asm_file)
     
     print(f"--- Mixed-Integer Linear Programming (MILP) Analysis ---")
     print(f"Total Instructions analyzed: {total}")
@@ -95,6 +91,13 @@ if __name__ == "__main__":
     print(f"Optimal merges (non-overlapping): {reduction}")
     print(f"Theoretical Size Reduction: {(reduction/total)*100:.2f}%")
     
+    if args.validate:
+        try:
+            check, solver_name = solve_cpsat_check(candidates), "CP-SAT"
+        except ImportError:
+            check, solver_name = solve_milp_check(candidates), "MILP"
+        print(f"{solver_name} cross-check: {check} ({'OK' if check == reduction else 'MISMATCH'})")
+    
     if reduction > 0:
         print(f"\nExample mergeable patterns:")
         for i in range(min(5, len(candidates))):
@@ -0,0 +1,142 @@
+"""
+Parsed-disassembly cache behind asm_ir.load().
+
+The asm file is parsed once into NumPy columns (one entry per instruction)
+and saved next to it as <name>.parsed.npz. Later runs load the arrays
+directly as long as the asm file's size and mtime are unchanged.
+"""
+
+import mmap
+import os
+import re
+from array import array
+import numpy as np
+
+# Bump when the parsed columns change meaning
+CACHE_VERSION = 2
+
+# One multiline pattern over the whole mmap'd file: group 1 is a function
+# header; otherwise groups 2/3 are an instruction's mnemonic and operands.
+# '.' is part of the mnemonic so b.eq/b.ne are kept whole, and
+# operand-less instructions (ret, nop) match with an empty operand group.
+line_re = re.compile(rb'^(?:[0-9a-f]+ <(.*)>:$|'
+                     rb'[ \t]*[0-9a-f]+:[ \t]+[0-9a-f]+[ \t]+([\w.]+)(?:[ \t]+(.*))?$)', re.MULTILINE)
+# Simple memory operand: reg, [base] or reg, [base, #offset]
+# args example: x8, [sp, #0x1c0]
+mem_re = re.compile(rb'(\w+),\s+\[(\w+)(?:,\s+#(-?0x[0-9a-f]+|[0-9]+))?\]')
+# Only these mnemonics carry a memory operand worth decoding
+_MEM_OPS = frozenset((b'ldr', b'str', b'ldp', b'stp', b'ldur', b'stur'))
+
+# The file is scanned in line-aligned windows of about this many bytes, so
+# only one window's worth of matched rows is alive at a time
+SCAN_WINDOW = 1 << 24
+
+# x0-x30 / w0-w30; bit i of a register mask is register i (w aliases x)
+_REG_BIT = {(p + str(i)).encode(): 1 << i for p in 'xw' for i in range(31)}
+# Maps every non-word byte to a space so operands split into word tokens
+_TOKENIZE = bytes(c if chr(c).isalnum() or c == ord('_') else ord(' ') for c in range(256))
+
+def reg_mask(text):
+    # Table lookup per operand token instead of a regex scan
+    mask = 0
+    for tok in text.translate(_TOKENIZE).split():
+        mask |= _REG_BIT.get(tok, 0)
+    return mask
+
+def scan_lines(mm):
+    # Yield (func_name, mnemonic, operands) rows window by window; each
+    # window ends just after a newline so no line is split across two
+    pos, size = 0, len(mm)
+    while pos < size:
+        end = mm.find(b'\n', pos + SCAN_WINDOW)
+        end = size if end < 0 else end + 1
+        yield from line_re.findall(mm, pos, end)
+        pos = end
+
+def parse_offset(text):
+    # '#' immediate of a memory operand: hex (0x1c0, -0x10) or decimal
+    if not text:
+        return 0
+    return int(text, 16) if b'x' in text else int(text)
+
+def cache_path(asm_file):
+    return os.path.splitext(asm_file)[0] + '.parsed.npz'
+
+def parse(asm_file):
+    # Structure-of-arrays: one column per field; opcodes, functions and base
+    # registers are interned to small integer IDs. Columns grow as typed
+    # machine arrays, not lists of Python ints.
+    opcode_to_id = {}
+    base_to_id = {}
+    func_names = ['unknown']
+    ops, func, base = array('i'), array('i'), array('i')
+    offset = array('q')
+    defs, uses = array('I'), array('I')
+    has_zero = bytearray()
+    current_func = 0
+    with open(asm_file, 'rb') as f, \
+            mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        # Operand strings repeat heavily in disassembly (stack slots, common
+        # register pairs), so each distinct one is decoded only once; the
+        # memory operand is decoded (base, offset) for load/store ops only
+        decoded = {}
+        mem_decoded = {}
+        for name, op, args in scan_lines(mm):
+            if not op:
+                func_names.append(name.decode())
+                current_func = len(func_names) - 1
+                continue
+
+            ops.append(opcode_to_id.setdefault(op.decode(), len(opcode_to_id)))
+            func.append(current_func)
+            fields = decoded.get(args)
+            if fields is None:
+                # Track registers used/defined (simplified)
+                d = reg_mask(args.split(b',', 1)[0]) if b',' in args else 0
+                fields = decoded[args] = (d, reg_mask(args) & ~d, b'0' in args)
+            mem = (-1, 0)
+            if op in _MEM_OPS:
+                mem = mem_decoded.get(args)
+                if mem is None:
+                    m = mem_re.search(args)
+                    mem = mem_decoded[args] = (
+                        base_to_id.setdefault(m.group(2), len(base_to_id)) if m else -1,
+                        parse_offset(m.group(3)) if m else 0,
+                    )
+            defs.append(fields[0])
+            uses.append(fields[1])
+            has_zero.append(fields[2])
+            base.append(mem[0])
+            offset.append(mem[1])
+    return {
+        'opcodes': np.array(list(opcode_to_id), dtype=str),
+        'func_names': np.array(func_names, dtype=str),
+        'ops': np.asarray(ops).astype(np.int32, copy=False),
+        'func': np.asarray(func).astype(np.int32, copy=False),
+        'defs': np.asarray(defs).astype(np.uint32, copy=False),
+        'uses': np.asarray(uses).astype(np.uint32, copy=False),
+        'base': np.asarray(base).astype(np.int32, copy=False),
+        'offset': np.asarray(offset).astype(np.int64, copy=False),
+        'has_zero': np.frombuffer(bytes(has_zero), dtype=bool),
+    }
+
+def load_or_parse(asm_file):
+    """Return the parsed columns for asm_file, reparsing only if the cache is stale"""
+    st = os.stat(asm_file)
+    key = np.array([CACHE_VERSION, st.st_size, st.st_mtime_ns], dtype=np.int64)
+    path = cache_path(asm_file)
+    try:
+        with np.load(path) as cached:
+            if np.array_equal(cached['key'], key):
+                return {name: cached[name] for name in cached.files if name != 'key'}
+    except (OSError, KeyError, ValueError):
+        pass
+
+    program = parse(asm_file)
+    # Written uncompressed: loading is the hot path, and write-then-rename
+    # keeps a concurrently starting analyzer from seeing a partial file
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        np.savez(f, key=key, **program)
+    os.replace(tmp, path)
+    return program
@@ -0,0 +1,249 @@
+"""
+Shared in-memory representation of build/hfdown_full.asm.
+
+load() returns a Program: structure-of-arrays NumPy columns with one entry
+per instruction, parsed once and cached on disk by asm_cache. The
+analyzers (analyze_asm.py, analyze_milp.py, analyze_sa.py) are thin CLIs
+over Program.describe(), Program.find_merges() and Program.anneal().
+"""
+
+import math
+import re
+from dataclasses import dataclass
+from functools import cached_property
+import numpy as np
+
+import asm_cache
+
+try:
+    from numba import njit
+except ImportError:
+    # Pure-Python fallback: same kernels, interpreted
+    def njit(*args, **kwargs):
+        return lambda f: f
+
+# Flat mnemonic -> category table, built once; dispatch by hash, not list scan
+_CAT = {m: 'Branch/Call' for m in ('b', 'bl', 'blr', 'br', 'ret', 'cbz', 'cbnz', 'tbz', 'tbnz')}
+_CAT.update({m: 'Load/Store' for m in ('ldr', 'ldp', 'ldrb', 'ldrh', 'ldur', 'ldurb', 'str', 'stp', 'strb', 'strh', 'stur', 'sturb')})
+_CAT.update({m: 'ALU/Data' for m in ('add', 'sub', 'mov', 'movk', 'movz', 'mvn', 'cmp', 'csel', 'cset', 'and', 'orr', 'eor', 'lsl', 'lsr', 'asr')})
+_CAT.update({m: 'FloatingPoint' for m in ('fadd', 'fsub', 'fmul', 'fdiv', 'fmov', 'fcmp', 'fcvt', 'scvtf', 'ucvtf')})
+_CAT.update({m: 'System/Other' for m in ('nop', 'hint', 'isb', 'dsb', 'dmb')})
+
+CATEGORIES = ('Branch/Call', 'Load/Store', 'ALU/Data', 'FloatingPoint', 'System/Other', 'Other')
+CAT_ID = {cat: i for i, cat in enumerate(CATEGORIES)}
+
+def categorize(mnemonic):
+    # objdump emits lowercase mnemonics, so no .lower() is needed here
+    return _CAT.get(mnemonic) or ('Branch/Call' if mnemonic.startswith('b.') else 'Other')
+
+# Module substrings in priority order: the first rule that occurs anywhere in
+# a demangled name wins
+_MODULE_RULES = (
+    ("HuggingFaceClient", "HuggingFace"),
+    ("KaggleClient", "Kaggle"),
+    ("HttpClient", "HTTP/1.1"),
+    ("Http3Client", "HTTP/3"),
+    ("QuicSocket", "QUIC/H3 Core"),
+    ("AsyncFileWriter", "IO/MMap"),
+    ("SecretScanner", "Security"),
+    ("json::", "JSON"),
+    ("RsyncClient", "Rsync"),
+    ("std::", "StdLib/Templates"),
+    ("abi:ne", "StdLib/Templates"),
+)
+_MODULE_PRIORITY = {pat: i for i, (pat, _) in enumerate(_MODULE_RULES)}
+# One automaton for all substrings; the lookahead reports overlapping hits
+_MODULE_RE = re.compile("(?=(" + "|".join(re.escape(pat) for pat, _ in _MODULE_RULES) + "))")
+
+def module_of(func):
+    hits = _MODULE_RE.findall(func)
+    if not hits:
+        return "Other/StdLib"
+    return _MODULE_RULES[min(_MODULE_PRIORITY[h] for h in hits)][1]
+
+def categorize_bulk(program):
+    # Per-instruction category IDs: each distinct opcode is categorized once,
+    # then gathered by opcode ID
+    op_cat = np.array([CAT_ID[categorize(op)] for op in program.opcodes.tolist()], dtype=np.int64)
+    return op_cat[program.ops]
+
+def max_disjoint_pairs(candidates):
+    # Every candidate merges an adjacent pair (i, i+1), so two candidates
+    # conflict only when they share an endpoint: the conflict graph is an
+    # interval graph, and an earliest-end-first greedy pass yields the
+    # maximum set of non-overlapping merges without a solver.
+    reduction = 0
+    last_end = -1
+    for start, end in sorted(candidates):
+        if start > last_end:
+            reduction += 1
+            last_end = end
+    return reduction
+
+@njit(cache=True)
+def get_energy(cand, state, counted):
+    # Count non-conflicting merges. Candidates are sorted (i, i+1) pairs, so
+    # a pair can only collide with the last merged pair's end index.
+    # counted[i] records whether pair i contributed to the count.
+    count = 0
+    last_end = -1
+    for i in range(cand.shape[0]):
+        if state[i] and cand[i, 0] > last_end:
+            counted[i] = 1
+            count += 1
+            last_end = cand[i, 1]
+        else:
+            counted[i] = 0
+    return -count # Minimize negative count
+
+@njit(cache=True)
+def flip(cand, state, counted, idx):
+    # Toggle candidate idx and repair the counted flags in O(1) amortized:
+    # pair k only depends on pair k-1, so a change propagates down a chain
+    # of overlapping pairs and stops at the first flag that is unchanged.
+    # Returns the change in merge count.
+    state[idx] ^= 1
+    delta = 0
+    for k in range(idx, cand.shape[0]):
+        blocked = k > 0 and counted[k - 1] == 1 and cand[k, 0] <= cand[k - 1, 1]
+        c = 1 if state[k] == 1 and not blocked else 0
+        if c == counted[k]:
+            break
+        delta += 1 if c else -1
+        counted[k] = c
+    return delta
+
+@njit(cache=True)
+def anneal_pairs(cand, iters, temp, cooling_rate, seed):
+    if seed >= 0:
+        np.random.seed(seed)
+    n = cand.shape[0]
+
+    # SA State: binary vector of which candidates to merge, one uint8 per
+    # candidate. best_state is allocated once and only overwritten in place.
+    current_state = (np.random.random(n) > 0.5).astype(np.uint8)
+    counted = np.empty(n, dtype=np.uint8)
+
+    current_energy = get_energy(cand, current_state, counted)
+    best_state = current_state.copy()
+    best_energy = current_energy
+    
+    for _ in range(iters):
+        # Move: Flip a random bit
+        idx = np.random.randint(0, n)
+        new_energy = current_energy - flip(cand, current_state, counted, idx)
+        
+        if new_energy < current_energy or np.random.random() < math.exp((current_energy - new_energy) / temp):
+            current_energy = new_energy
+            if current_energy < best_energy:
+                best_energy = current_energy
+                best_state[:] = current_state
+        else:
+            flip(cand, current_state, counted, idx) # Backtrack
+            
+        temp *= cooling_rate
+
+    return best_energy
+
+def iter_ldst_pairs(program):
+    # (i, i+1) index pairs of LDR/STR candidates, in order
+    for i in program.candidates_ldst().tolist():
+        yield i, i + 1
+
+@dataclass
+class Program:
+    opcodes: np.ndarray     # opcode ID -> mnemonic
+    func_names: np.ndarray  # function ID -> name; 0 is "unknown"
+    ops: np.ndarray         # per instruction: opcode ID
+    func: np.ndarray        # per instruction: function ID
+    defs: np.ndarray        # per instruction: defined-register mask
+    uses: np.ndarray        # per instruction: used-register mask
+    base: np.ndarray        # per instruction: base register ID of a load/store "[base, #offset]", -1 if none
+    offset: np.ndarray      # per instruction: #offset of that memory operand, 0 if none
+    has_zero: np.ndarray    # per instruction: operands contain a '0'
+
+    def __len__(self):
+        return len(self.ops)
+
+    @cached_property
+    def opcode_to_id(self):
+        return {op: i for i, op in enumerate(self.opcodes.tolist())}
+
+    def op_id(self, mnemonic):
+        # -1 never matches, so rules on absent opcodes select nothing
+        return self.opcode_to_id.get(mnemonic, -1)
+
+    def candidates_ldst(self):
+        # Heuristic: Look for consecutive LDR or STR instructions to the same base register with adjacent offsets
+        # This is a classic pattern for LDP/STP (Load/Store Pair) merging.
+        # (Only the base is compared; a simplified check for the MILP demonstration)
+        ops, base = self.ops, self.base
+        op1 = ops[:-1]
+        same_ldst = (op1 == ops[1:]) & ((op1 == self.op_id('ldr')) | (op1 == self.op_id('str')))
+        same_base = (base[:-1] == base[1:]) & (base[:-1] >= 0)
+        return np.flatnonzero(same_ldst & same_base)
+
+    def candidates_equiv(self):
+        # Vectorized pairwise test over (i, i+1) for the SA merge rules;
+        # returns the indices i
+        op1, op2 = self.ops[:-1], self.ops[1:]
+        # Rule 1: CMP + B.cond -> CBZ/CBNZ
+        rule1 = (op1 == self.op_id('cmp')) & ((op2 == self.op_id('b.eq')) | (op2 == self.op_id('b.ne'))) & \
+                self.has_zero[:-1]
+        # Rule 2: LDR/STR pairs for LDP/STP
+        rule2 = np.zeros(len(op1), dtype=bool)
+        rule2[self.candidates_ldst()] = True
+        # Rule 3: MOV + ADD -> ADD (immediate)
+        rule3 = (op1 == self.op_id('mov')) & (op2 == self.op_id('add')) & ((self.defs[:-1] & self.uses[1:]) != 0)
+        return np.flatnonzero(rule1 | rule2 | rule3)
+
+    def describe(self, top=10):
+        # Returns ([(module, total, per-category counts)] sorted by total,
+        # [(total, function)] for the `top` largest functions)
+        # Functions are keyed by name, so repeated names share one row
+        name_to_id = {}
+        name_of_func = np.array([name_to_id.setdefault(n, len(name_to_id)) for n in self.func_names.tolist()],
+                                dtype=np.int64)
+        names = list(name_to_id)
+
+        # (function, category) histogram in a single bincount over all instructions
+        num_cats = len(CATEGORIES)
+        rows = name_of_func[self.func]
+        counts = np.bincount(rows * num_cats + categorize_bulk(self),
+                             minlength=len(names) * num_cats).reshape(len(names), num_cats)
+        totals = counts.sum(axis=1)
+        # Functions that own instructions, in order of their first instruction
+        active, first = np.unique(rows, return_index=True)
+        active = active[np.argsort(first)]
+
+        # Aggregate by module
+        module_to_id = {}
+        module_of_row = np.array([module_to_id.setdefault(module_of(names[r]), len(module_to_id)) for r in active],
+                                 dtype=np.int64)
+        module_counts = np.zeros((len(module_to_id), num_cats), dtype=np.int64)
+        np.add.at(module_counts, module_of_row, counts[active])
+        module_totals = module_counts.sum(axis=1)
+        modules = list(module_to_id)
+
+        # Sort by total instructions; ties keep first-seen order
+        by_module = [(modules[m], module_totals[m], module_counts[m])
+                     for m in np.argsort(-module_totals, kind='stable')]
+        largest = [(totals[r], names[r]) for r in active[np.argsort(-totals[active], kind='stable')][:top]]
+        return by_module, largest
+
+    def find_merges(self):
+        # Returns (LDR/STR candidate pairs, maximum non-overlapping merges)
+        candidates = list(iter_ldst_pairs(self))
+        return candidates, max_disjoint_pairs(candidates)
+
+    def anneal(self, iters=2000, seed=-1):
+        # Simulated annealing over the SA merge rules; returns the best merge count
+        idx = self.candidates_equiv()
+        if len(idx) == 0:
+            return 0
+        cand = np.column_stack((idx, idx + 1)).astype(np.int32)
+        return -anneal_pairs(cand, iters, 10.0, 0.995, seed)
+
+def load(asm_file):
+    """Parse asm_file (or load its cached parse) into a Program"""
+    return Program(**asm_cache.load_or_parse(asm_file))
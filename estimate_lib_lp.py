@@ -1,7 +1,37 @@
+import argparse
 import numpy as np
-from scipy.optimize import linprog
 
-def estimate_library_specialization():
+# Minimum functional fraction per library: GET/H2 for libcurl,
+# TLS1.3/SHA256 for OpenSSL, H3 for ngtcp2
+MIN_FRACTIONS = np.array([0.15, 0.05, 0.40])
+
+def specialize(totals, min_fractions=MIN_FRACTIONS):
+    # Closed-form optimum of the LP: libraries are not coupled, so each one
+    # keeps exactly its lower bound and the remainder is waste. Broadcasts
+    # over leading axes, so many scenarios are evaluated in one call.
+    totals = np.asarray(totals, dtype=float)
+    used = np.minimum(np.maximum(min_fractions * totals, 0), totals)
+    return used, totals - used
+
+def solve_specialization_lp(totals, min_fractions=MIN_FRACTIONS):
+    # Reference LP formulation, used to validate specialize
+    from scipy.optimize import linprog
+
+    c = [1, 0, 1, 0, 1, 0]
+    A_eq = [
+        [1, 1, 0, 0, 0, 0], 
+        [0, 0, 1, 1, 0, 0], 
+        [0, 0, 0, 0, 1, 1]  
+    ]
+    A_ub = [
+        [-1, 0, 0, 0, 0, 0],
+        [0, 0, -1, 0, 0, 0],
+        [0, 0, 0, 0, -1, 0],
+    ]
+    b_ub = list(-np.asarray(min_fractions) * np.asarray(totals))
+    return linprog(c, A_ub=A_ub, b_ub=b_ub, A_eq=A_eq, b_eq=list(totals), method='highs')
+
+def estimate_library_specialization(validate=False):
     # We want to minimize the functional set of instructions by assuming 
     # everything else can be stripped if we specialize to the exact usage.
     
@@ -15,7 +45,6 @@ def estimate_library_specialization():
     # Target: Minimize the SUM of the instructions actually included in the hot path.
     # Objective: min (x0 + x2 + x4)
     # The 'waste' variables x1, x3, x5 represent the potential for removal.
-    c = [1, 0, 1, 0, 1, 0]
 
     CURL_TOTAL = 150
     OSSL_TOTAL = 800
@@ -23,25 +52,15 @@ def estimate_library_specialization():
 
     # Equality Constraints (A_eq * x = b_eq)
     # Total = Used + Waste
-    A_eq = [
-        [1, 1, 0, 0, 0, 0], 
-        [0, 0, 1, 1, 0, 0], 
-        [0, 0, 0, 0, 1, 1]  
-    ]
-    b_eq = [CURL_TOTAL, OSSL_TOTAL, QUIC_TOTAL]
-
     # Inequality Constraints (Lower bounds for functional correctness)
-    A_ub = [
-        [-1, 0, 0, 0, 0, 0], # x0 >= 0.15 * CURL (min set for GET/H2)
-        [0, 0, -1, 0, 0, 0], # x2 >= 0.05 * OSSL (min set for TLS1.3/SHA256)
-        [0, 0, 0, 0, -1, 0], # x4 >= 0.40 * QUIC (min set for H3)
-    ]
-    b_ub = [-0.15 * CURL_TOTAL, -0.05 * OSSL_TOTAL, -0.40 * QUIC_TOTAL]
-
-    res = linprog(c, A_ub=A_ub, b_ub=b_ub, A_eq=A_eq, b_eq=b_eq, method='highs')
+    # x0 >= 0.15 * CURL (min set for GET/H2)
+    # x2 >= 0.05 * OSSL (min set for TLS1.3/SHA256)
+    # x4 >= 0.40 * QUIC (min set for H3)
+    totals = np.array([CURL_TOTAL, OSSL_TOTAL, QUIC_TOTAL], dtype=float)
+    used, waste = specialize(totals)
 
     total_curr = CURL_TOTAL + OSSL_TOTAL + QUIC_TOTAL
-    total_opt = res.fun
+    total_opt = used.sum()
     saved = total_curr - total_opt
 
     print(f"--- Library Specialization LP Estimate (Refined) ---")
@@ -51,9 +70,18 @@ def estimate_library_specialization():
     print(f"Instruction Reduction:             {(saved/total_curr)*100:.1f}%")
 
     print(f"\nOptimization Breakdown:")
-    print(f"  libcurl:  {res.x[1]:.1f}k instructions removed (Stripping Proxies, FTP, SMTP, IMAP, etc)")
-    print(f"  OpenSSL:  {res.x[3]:.1f}k instructions removed (Stripping RSA, DSA, AES-CBC, Legacy TLS)")
-    print(f"  ngtcp2:   {res.x[5]:.1f}k instructions removed (Stripping unused Congestion Control/Debug)")
+    print(f"  libcurl:  {waste[0]:.1f}k instructions removed (Stripping Proxies, FTP, SMTP, IMAP, etc)")
+    print(f"  OpenSSL:  {waste[1]:.1f}k instructions removed (Stripping RSA, DSA, AES-CBC, Legacy TLS)")
+    print(f"  ngtcp2:   {waste[2]:.1f}k instructions removed (Stripping unused Congestion Control/Debug)")
+
+    if validate:
+        res = solve_specialization_lp(totals)
+        status = "OK" if np.isclose(res.fun, total_opt) else "MISMATCH"
+        print(f"\nLP cross-check: {res.fun:.1f}k vs closed form {total_opt:.1f}k ({status})")
 
 if __name__ == "__main__":
-    estimate_library_specialization()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Estimate library specialization savings")
+    parser.add_argument("--validate", action="store_true",
+                        help="Cross-check the closed-form optimum against scipy's HiGHS LP solver")
+    args = parser.parse_args()
+    estimate_library_specialization(validate=args.validate)
\ No newline at end of file
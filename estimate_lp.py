@@ -1,7 +1,33 @@
+import argparse
 import numpy as np
-from scipy.optimize import linprog
 
-def solve_refined_frontier():
+def frontier_optimum(target_instr, target_branches, l1_cap, l2_penalty, ram_penalty, br_penalty,
+                     mispredict_floor=0.02):
+    # Closed-form optimum of the frontier LP. L1 hits are free and L2 is
+    # cheaper than RAM, so fill L1 up to capacity and spill the rest to L2;
+    # mispredictions sit at their floor. Works elementwise on NumPy arrays,
+    # so a whole parameter sweep is evaluated in one call.
+    target_instr = np.asarray(target_instr, dtype=float)
+    target_branches = np.asarray(target_branches, dtype=float)
+    l1 = np.minimum(target_instr, l1_cap)
+    l2 = target_instr - l1
+    ram = np.zeros_like(target_instr)
+    misbr = mispredict_floor * target_branches
+    x = np.stack([l1, l2, ram, target_branches - misbr, misbr], axis=-1)
+    fun = l2 * l2_penalty + ram * ram_penalty + misbr * br_penalty
+    return fun, x
+
+def solve_frontier_lp(c, target_instr, target_branches, l1_cap, mispredict_floor=0.02):
+    # Reference LP formulation, used to validate frontier_optimum
+    from scipy.optimize import linprog
+
+    A_eq = [[1, 1, 1, 0, 0], [0, 0, 0, 1, 1]]
+    b_eq = [target_instr, target_branches]
+    A_ub = [[1, 0, 0, 0, 0], [0, 0, 0, 0, -1]]
+    b_ub = [l1_cap, -mispredict_floor * target_branches] # mispredict floor
+    return linprog(c, A_ub=A_ub, b_ub=b_ub, A_eq=A_eq, b_eq=b_eq, method='highs')
+
+def solve_refined_frontier(validate=False):
     # Hardware Parameters
     L1_LATENCY = 1.0      # cycle
     L2_LATENCY = 12.0     # cycles
@@ -40,13 +66,10 @@ def solve_refined_frontier():
     target_instr = 8000
     target_branches = target_instr * 0.10 # Lower branch density in SIMD/Flat code
     
-    A_eq = [[1, 1, 1, 0, 0], [0, 0, 0, 1, 1]]
-    b_eq = [target_instr, target_branches]
-    A_ub = [[1, 0, 0, 0, 0], [0, 0, 0, 0, -1]]
-    b_ub = [L1_CAP, -0.02 * target_branches] # 2% mispredict floor
-
-    res = linprog(c, A_ub=A_ub, b_ub=b_ub, A_eq=A_eq, b_eq=b_eq, method='highs')
-    opt_cycles = (target_instr * BASE_CPI) + (target_instr * L1_LATENCY) + res.fun
+    # 2% mispredict floor
+    fun, x = frontier_optimum(target_instr, target_branches, L1_CAP,
+                              c[1], c[2], c[4], mispredict_floor=0.02)
+    opt_cycles = (target_instr * BASE_CPI) + (target_instr * L1_LATENCY) + fun
 
     print(f"--- Code Size & Branch Prediction Frontier ---")
     print(f"Current Working Set: {total_instr} instructions (~{total_instr*4/1024:.1f} KB)")
@@ -56,10 +79,19 @@ def solve_refined_frontier():
     print(f"Potential Speedup: {curr_cycles/opt_cycles:.2f}x")
     
     print(f"\nBreakdown of Gains:")
-    cache_gain = (curr_l2_hits * L2_LATENCY + curr_ram_hits * RAM_LATENCY) - res.fun
-    branch_gain = (curr_misbr - res.x[4]) * BR_MIS_PENALTY
+    cache_gain = (curr_l2_hits * L2_LATENCY + curr_ram_hits * RAM_LATENCY) - fun
+    branch_gain = (curr_misbr - x[4]) * BR_MIS_PENALTY
     print(f"  From Cache Locality:   {cache_gain/curr_cycles*100:.1f}% reduction")
     print(f"  From Branch Predictor: {branch_gain/curr_cycles*100:.1f}% reduction")
 
+    if validate:
+        res = solve_frontier_lp(c, target_instr, target_branches, L1_CAP)
+        status = "OK" if np.isclose(res.fun, fun) else "MISMATCH"
+        print(f"\nLP cross-check: {res.fun:,.1f} vs closed form {fun:,.1f} ({status})")
+
 if __name__ == "__main__":
-    solve_refined_frontier()
+    parser = argparse.ArgumentParser(description="Estimate the code-size / branch-prediction frontier")
+    parser.add_argument("--validate", action="store_true",
+                        help="Cross-check the closed-form optimum against scipy's HiGHS LP solver")
+    args = parser.parse_args()
+    solve_refined_frontier(validate=args.validate)
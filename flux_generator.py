@@ -10,13 +10,17 @@ and automatically commits results to git.
 import argparse
 import multiprocessing as mp
 import os
+import subprocess
 import sys
 import time
 import logging
+from collections import deque
+from concurrent.futures import (FIRST_COMPLETED, BrokenExecutor, Future, ProcessPoolExecutor,
+                                ThreadPoolExecutor, wait)
 from pathlib import Path
-from typing import List, Optional
-import traceback
+from typing import List, Optional, Tuple
 import json
+import hashlib
 from datetime import datetime
 
 # Configure logging
@@ -26,11 +30,171 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+MODEL_ID = "black-forest-labs/FLUX.1-schnell"
 
-def setup_flux_model():
+# The diffusers layout only; the repo root also holds single-file checkpoints
+# (flux1-schnell.safetensors, ae.safetensors) the pipeline never loads
+MODEL_PATTERNS = [
+    "model_index.json",
+    "scheduler/*",
+    "transformer/*",
+    "vae/*",
+    "text_encoder*/*",
+    "tokenizer*/*",
+]
+
+
+def gpu_count() -> int:
+    """
+    Number of CUDA devices visible to this process (0 without torch or CUDA)
+    """
+    try:
+        import torch
+        return torch.cuda.device_count() if torch.cuda.is_available() else 0
+    except ImportError:
+        return 0
+
+
+def prefetch_model():
+    """
+    Download (or verify) the model snapshot once, before any child process loads it
+    
+    Afterwards the Hub is put in offline mode for the spawned children, so the
+    encoder and every worker resolve all files from the local cache instead of
+    each contacting the Hub and waiting on the same download locks.
+    """
+    try:
+        from huggingface_hub import snapshot_download
+    except ImportError:
+        return
+    
+    logger.info(f"Fetching {MODEL_ID} snapshot...")
+    path = snapshot_download(MODEL_ID, allow_patterns=MODEL_PATTERNS)
+    os.environ["HF_HUB_OFFLINE"] = "1"
+    logger.info(f"Model snapshot ready in {path}")
+
+
+def load_quantized(model_cls, subfolder: str, quant: str, bnb_config_cls):
+    """
+    Load one large pipeline module with quantized weights
+    
+    Args:
+        model_cls: Module class, e.g. FluxTransformer2DModel or T5EncoderModel
+        subfolder: Subfolder of the module inside the model repo
+        quant: "nf4" (bitsandbytes 4-bit) or "fp8" (optimum-quanto float8 weights)
+        bnb_config_cls: BitsAndBytesConfig class of the library model_cls comes from
+    """
+    import torch
+    
+    if quant == "nf4":
+        module = model_cls.from_pretrained(
+            MODEL_ID, subfolder=subfolder, torch_dtype=torch.bfloat16,
+            quantization_config=bnb_config_cls(
+                load_in_4bit=True, bnb_4bit_quant_type="nf4", bnb_4bit_compute_dtype=torch.bfloat16
+            )
+        )
+    else:
+        from optimum.quanto import freeze, qfloat8, quantize
+        
+        module = model_cls.from_pretrained(MODEL_ID, subfolder=subfolder, torch_dtype=torch.bfloat16)
+        # Quantized on the host, so the bf16 weights never reach the GPU
+        quantize(module, weights=qfloat8)
+        freeze(module)
+    
+    logger.info(f"Loaded {subfolder} with {quant} weights")
+    return module
+
+
+def embedding_path(embeds_dir: str, prompt: str) -> str:
+    """
+    Cache file holding the text-encoder outputs for prompt
+    """
+    return os.path.join(embeds_dir, hashlib.sha256(prompt.encode()).hexdigest() + ".pt")
+
+
+def encode_prompts(prompts: List[str], embeds_dir: str, quant: str = "none", batch_size: int = 16):
+    """
+    Run the CLIP and T5 text encoders once over all prompts and cache the results
+    
+    Prompts already present in embeds_dir are skipped, so reruns over the same
+    prompts file only encode new prompts.
+    
+    Args:
+        prompts: Text prompts to encode
+        embeds_dir: Directory for the cached prompt_embeds / pooled_prompt_embeds
+        quant: Weight quantization of the T5 encoder: "none", "fp8" or "nf4"
+        batch_size: Prompts per encoder call
+    """
+    os.makedirs(embeds_dir, exist_ok=True)
+    todo = sorted({p for p in prompts if not os.path.exists(embedding_path(embeds_dir, p))})
+    if not todo:
+        logger.info(f"All {len(prompts)} prompt embeddings already cached in {embeds_dir}")
+        return
+    
+    import torch
+    from diffusers import FluxPipeline
+    
+    device = "cuda:0" if torch.cuda.is_available() else "cpu"
+    components = {"transformer": None, "vae": None}
+    if quant != "none" and device != "cpu":
+        from transformers import BitsAndBytesConfig, T5EncoderModel
+        components["text_encoder_2"] = load_quantized(T5EncoderModel, "text_encoder_2", quant, BitsAndBytesConfig)
+    
+    logger.info(f"Encoding {len(todo)} prompts on {device}...")
+    pipe = FluxPipeline.from_pretrained(
+        MODEL_ID,
+        torch_dtype=torch.bfloat16 if device != "cpu" else torch.float32,
+        **components
+    ).to(device)
+    
+    with torch.inference_mode():
+        for start in range(0, len(todo), batch_size):
+            batch = todo[start:start + batch_size]
+            # 256 tokens is the schnell pipeline's default T5 sequence length
+            prompt_embeds, pooled_prompt_embeds, _ = pipe.encode_prompt(
+                prompt=batch, prompt_2=None, device=device, max_sequence_length=256
+            )
+            for i, prompt in enumerate(batch):
+                torch.save({
+                    "prompt_embeds": prompt_embeds[i:i + 1].cpu(),
+                    "pooled_prompt_embeds": pooled_prompt_embeds[i:i + 1].cpu()
+                }, embedding_path(embeds_dir, prompt))
+    
+    logger.info(f"Cached {len(todo)} prompt embeddings in {embeds_dir}")
+
+
+def load_embeddings(embeds_dir: str, prompts: List[str], device: str):
+    """
+    Load and stack the cached embeddings of prompts for one batched call
+    
+    Returns:
+        (prompt_embeds, pooled_prompt_embeds) on device
+    """
+    import torch
+    
+    cached = [torch.load(embedding_path(embeds_dir, p), map_location=device) for p in prompts]
+    return (torch.cat([c["prompt_embeds"] for c in cached]),
+            torch.cat([c["pooled_prompt_embeds"] for c in cached]))
+
+
+def setup_flux_model(
+    device: Optional[str] = None,
+    compile_mode: Optional[str] = None,
+    quant: str = "none",
+    low_vram: bool = False
+):
     """
     Setup and load Flux1 Schnell model using vanilla PyTorch
     
+    Args:
+        device: Device to load the model on, e.g. "cuda:1"
+                (default: first GPU if available, otherwise CPU)
+        compile_mode: torch.compile mode for the transformer and VAE decoder
+                      (None: run eagerly)
+        quant: Weight quantization of the transformer: "none", "fp8" or "nf4"
+        low_vram: Keep the weights in host memory and stream each submodule to
+                  the GPU only while it runs (sequential CPU offload)
+    
     Returns:
         Loaded pipeline object
     """
@@ -41,30 +205,65 @@ def setup_flux_model():
         logger.info("Loading Flux1 Schnell model...")
         
         # Check CUDA availability
-        if torch.cuda.is_available():
-            device = "cuda"
-            logger.info(f"CUDA available: {torch.cuda.get_device_name(0)}")
-            logger.info(f"GPU Memory: {torch.cuda.get_device_properties(0).total_memory / 1e9:.2f} GB")
+        if device is None:
+            device = "cuda:0" if torch.cuda.is_available() else "cpu"
+        if device.startswith("cuda"):
+            torch.cuda.set_device(device)
+            logger.info(f"CUDA available: {torch.cuda.get_device_name(device)}")
+            logger.info(f"GPU Memory: {torch.cuda.get_device_properties(device).total_memory / 1e9:.2f} GB")
         else:
-            device = "cpu"
             logger.warning("CUDA not available, using CPU (will be very slow)")
+            if quant != "none":
+                logger.warning(f"{quant} quantization needs CUDA, loading full-precision weights")
+                quant = "none"
+            low_vram = False
+        if low_vram and compile_mode:
+            logger.warning("torch.compile is not used with sequential CPU offload")
+            compile_mode = None
         
-        # Load the model
+        # Load the model; prompts arrive pre-encoded (see encode_prompts), so
+        # the text encoders are never loaded here
+        components = {"text_encoder": None, "text_encoder_2": None, "tokenizer": None, "tokenizer_2": None}
+        if quant != "none":
+            from diffusers import BitsAndBytesConfig, FluxTransformer2DModel
+            components["transformer"] = load_quantized(FluxTransformer2DModel, "transformer", quant, BitsAndBytesConfig)
         pipe = FluxPipeline.from_pretrained(
-            "black-forest-labs/FLUX.1-schnell",
-            torch_dtype=torch.bfloat16 if device == "cuda" else torch.float32
+            MODEL_ID,
+            torch_dtype=torch.bfloat16 if device.startswith("cuda") else torch.float32,
+            **components
         )
         
-        # Move to GPU if available
-        pipe = pipe.to(device)
+        if low_vram:
+            # The offload hooks move each submodule themselves; calling
+            # .to(device) first would allocate the whole pipeline on the GPU
+            pipe.enable_sequential_cpu_offload(device=device)
+            logger.info("Enabled sequential CPU offload")
+        else:
+            # Each worker owns its GPU exclusively, so the full bf16 pipeline
+            # stays resident there; CPU offload on top of .to(device) would
+            # only allocate the weights twice
+            pipe = pipe.to(device)
         
-        # Enable memory optimizations
-        if device == "cuda":
-            try:
-                pipe.enable_model_cpu_offload()
-                logger.info("Enabled CPU offload for memory efficiency")
-            except Exception as e:
-                logger.warning(f"Could not enable CPU offload: {e}")
+        if device.startswith("cuda"):
+            # Flash / memory-efficient SDPA kernels for the MMDiT attention,
+            # TF32 for the remaining fp32 matmuls and convolutions
+            torch.backends.cuda.enable_flash_sdp(True)
+            torch.backends.cuda.enable_mem_efficient_sdp(True)
+            torch.backends.cuda.matmul.allow_tf32 = True
+            torch.backends.cudnn.allow_tf32 = True
+            torch.set_float32_matmul_precision("high")
+            # The VAE is convolutional and runs faster in NHWC (not under
+            # offload: the hooks reload its weights from the CPU copies)
+            if not low_vram:
+                pipe.vae.to(memory_format=torch.channels_last)
+        
+        if compile_mode:
+            # Compilation itself happens lazily on the first pipeline call.
+            # Every denoising step runs the transformer at the same shapes, so
+            # "reduce-overhead" / "max-autotune" also capture it as a CUDA graph.
+            pipe.transformer = torch.compile(pipe.transformer, mode=compile_mode, fullgraph=True)
+            pipe.vae.decoder = torch.compile(pipe.vae.decoder, mode=compile_mode, fullgraph=True)
+            logger.info(f"Compiled transformer and VAE decoder with torch.compile (mode={compile_mode})")
         
         logger.info(f"Model loaded successfully on {device}")
         return pipe
@@ -74,106 +273,251 @@ def setup_flux_model():
         raise
 
 
-def generate_image(pipe, prompt: str, output_path: str, num_inference_steps: int = 4):
+# Rough activation footprint of one 1024x1024 image in a bf16 schnell batch,
+# used to cap the batch size to what fits in free VRAM
+BATCH_BYTES_PER_IMAGE = 3 * 1024**3
+
+
+def fit_batch_size(batch_size: int, device: str) -> int:
     """
-    Generate a single image from a prompt
+    Cap the requested batch size by the free memory left on device
+    
+    Args:
+        batch_size: Requested number of prompts per pipeline call
+        device: Device the pipeline was loaded on
+    """
+    if not device.startswith("cuda"):
+        return batch_size
+    
+    import torch
+    free, _ = torch.cuda.mem_get_info(device)
+    fitted = max(1, min(batch_size, free // BATCH_BYTES_PER_IMAGE))
+    if fitted < batch_size:
+        logger.info(f"Batch size {batch_size} reduced to {fitted} ({free / 1e9:.1f} GB free on {device})")
+    return fitted
+
+
+def generate_images(pipe, embeds, num_inference_steps: int = 4):
+    """
+    Generate one image per prompt in a single batched pipeline call
     
     Args:
         pipe: Flux pipeline object
-        prompt: Text prompt for generation
-        output_path: Where to save the generated image
+        embeds: (prompt_embeds, pooled_prompt_embeds) of the prompts, from load_embeddings
         num_inference_steps: Number of inference steps (default 4 for schnell)
+    
+    Returns:
+        List of PIL images, in prompt order
     """
-    try:
-        logger.info(f"Generating image for: {prompt[:50]}...")
-        
-        # Generate image
-        image = pipe(
-            prompt,
-            num_inference_steps=num_inference_steps,
-            guidance_scale=0.0  # Schnell doesn't need guidance
-        ).images[0]
-        
-        # Save image
-        image.save(output_path)
-        logger.info(f"Image saved to: {output_path}")
-        
-        return True
-        
-    except Exception as e:
-        logger.error(f"Failed to generate image: {e}")
-        return False
+    prompt_embeds, pooled_prompt_embeds = embeds
+    logger.info(f"Generating {len(prompt_embeds)} images...")
+    
+    # Generate images; the whole batch shares each denoising step
+    return pipe(
+        prompt_embeds=prompt_embeds,
+        pooled_prompt_embeds=pooled_prompt_embeds,
+        num_inference_steps=num_inference_steps,
+        guidance_scale=0.0  # Schnell doesn't need guidance
+    ).images
 
 
-def worker_process(
-    worker_id: int,
-    prompts: List[str],
-    output_dir: str,
-    status_queue: mp.Queue,
-    num_inference_steps: int = 4
+def pad_prompts(prompts: List[str], size: int) -> List[str]:
+    """
+    prompts padded to size by repeating the last one
+    
+    A compiled pipeline (CUDA graphs, fullgraph=True) recompiles for every new
+    batch shape, so its calls always use the warmed-up size; the images of the
+    padding are dropped.
+    """
+    return prompts + prompts[-1:] * (size - len(prompts))
+
+
+# Images are written under this suffix and renamed into place when complete
+PARTIAL_SUFFIX = ".partial"
+
+
+def save_image(image, output_path: str, image_format: str = "png"):
+    """
+    Encode and write one image
+    
+    The file only appears under output_path once fully written, so a git
+    commit triggered by another worker's batch never picks up a partial file.
+    
+    Args:
+        image: PIL image
+        output_path: Destination file
+        image_format: "png" (libspng via pyspng when installed), "jpg" or "webp"
+    """
+    tmp_path = output_path + PARTIAL_SUFFIX
+    if image_format == "png":
+        # zlib level 1: the files are a little larger, but encoding is several
+        # times faster than PIL's default level 6
+        try:
+            import numpy as np
+            from pyspng import encode as spng_encode  # only in newer pyspng releases
+        except ImportError:
+            image.save(tmp_path, "PNG", compress_level=1)
+        else:
+            with open(tmp_path, "wb") as f:
+                f.write(spng_encode(np.asarray(image), compress_level=1))
+    elif image_format == "jpg":
+        # Pillow's JPEG encoder is libjpeg-turbo
+        image.save(tmp_path, "JPEG", quality=95, optimize=False)
+    else:
+        image.save(tmp_path, "WEBP", quality=95, method=0)
+    os.replace(tmp_path, output_path)
+
+
+# Per-process worker state, filled in once by init_worker
+_worker = {}
+
+
+def init_worker(
+    device_queue,
+    embeds_dir: str,
+    warmup_prompts: List[str],
+    num_inference_steps: int = 4,
+    batch_size: int = 4,
+    compile_mode: Optional[str] = None,
+    quant: str = "none",
+    image_format: str = "png",
+    low_vram: bool = False
 ):
     """
-    Worker process for generating images
+    Executor initializer: claim a device and load the model once per worker
     
     Args:
-        worker_id: ID of this worker
-        prompts: List of prompts to process
-        output_dir: Output directory for images
-        status_queue: Queue for reporting status
+        device_queue: Queue of (worker ID, device) pairs, one per worker
+        embeds_dir: Directory of the cached prompt embeddings
+        warmup_prompts: Prompts used to warm up a compiled model
         num_inference_steps: Number of inference steps
+        batch_size: Maximum number of prompts per pipeline call
+        compile_mode: torch.compile mode, None to run eagerly
+        quant: Weight quantization: "none", "fp8" or "nf4"
+        image_format: Output image format: "png", "jpg" or "webp"
+        low_vram: Use sequential CPU offload for GPUs with less than 8 GB
     """
-    try:
-        logger.info(f"Worker {worker_id} starting with {len(prompts)} prompts")
-        
-        # Load model (each process loads its own copy)
-        pipe = setup_flux_model()
-        
-        # Process prompts
-        for idx, prompt in enumerate(prompts):
-            try:
-                # Create output filename
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                filename = f"worker{worker_id}_image{idx}_{timestamp}.png"
-                output_path = os.path.join(output_dir, filename)
-                
-                # Generate image
-                success = generate_image(pipe, prompt, output_path, num_inference_steps)
-                
-                # Report status
-                status_queue.put({
-                    "worker_id": worker_id,
-                    "prompt_idx": idx,
-                    "prompt": prompt,
-                    "output_path": output_path,
-                    "success": success,
-                    "timestamp": timestamp
-                })
-                
-            except Exception as e:
-                logger.error(f"Worker {worker_id} failed on prompt {idx}: {e}")
-                status_queue.put({
-                    "worker_id": worker_id,
-                    "prompt_idx": idx,
-                    "prompt": prompt,
-                    "success": False,
-                    "error": str(e),
-                    "timestamp": datetime.now().strftime("%Y%m%d_%H%M%S")
-                })
-        
-        logger.info(f"Worker {worker_id} completed all prompts")
-        status_queue.put({
-            "worker_id": worker_id,
-            "status": "completed"
-        })
-        
-    except Exception as e:
-        logger.error(f"Worker {worker_id} crashed: {e}")
-        logger.error(traceback.format_exc())
-        status_queue.put({
+    worker_id, device = device_queue.get()
+    logger.info(f"Worker {worker_id} starting on {device}")
+    
+    # Load model (one copy per GPU)
+    pipe = setup_flux_model(device, compile_mode, quant, low_vram)
+    batch_size = fit_batch_size(batch_size, device)
+    # (setup_flux_model does not compile under low_vram)
+    fixed_shape = bool(compile_mode) and not low_vram
+    
+    if fixed_shape and warmup_prompts:
+        # Pay the compilation cost up front at the one batch shape used below
+        logger.info(f"Worker {worker_id} warming up compiled model...")
+        prompt_embeds, pooled_prompt_embeds = load_embeddings(
+            embeds_dir, pad_prompts(warmup_prompts[:batch_size], batch_size), device)
+        pipe(prompt_embeds=prompt_embeds, pooled_prompt_embeds=pooled_prompt_embeds,
+             num_inference_steps=num_inference_steps, guidance_scale=0.0)
+    
+    # Images are encoded and written off the generation thread
+    saver = ThreadPoolExecutor(max_workers=2, thread_name_prefix=f"saver{worker_id}")
+    
+    _worker.update(worker_id=worker_id, device=device, pipe=pipe, batch_size=batch_size, saver=saver,
+                   fixed_shape=fixed_shape, embeds_dir=embeds_dir, num_inference_steps=num_inference_steps,
+                   image_format=image_format)
+
+
+def generate_batch(prompts: List[Tuple[int, str]], output_dir: str) -> List[dict]:
+    """
+    Executor task: generate images for a batch of prompts
+    
+    Args:
+        prompts: List of (prompt index, prompt) pairs to process
+        output_dir: Output directory for images
+    
+    Returns:
+        One status dict per prompt
+    """
+    worker_id, device, batch_size = _worker["worker_id"], _worker["device"], _worker["batch_size"]
+    saver, image_format = _worker["saver"], _worker["image_format"]
+    statuses = []
+    saves = []
+    # One timestamp for the whole task; names no longer depend on it
+    timestamp = time.time_ns()
+    
+    # The batch may be larger than what fits this worker's VRAM. PNG encoding
+    # runs on the saver threads, overlapping the next sub-batch's denoising.
+    for start in range(0, len(prompts), batch_size):
+        batch = prompts[start:start + batch_size]
+        try:
+            # Create output filenames from the global prompt index, which is
+            # unique, unlike a per-second timestamp
+            output_paths = [
+                os.path.join(output_dir, f"worker{worker_id}_image{idx:06d}.{image_format}")
+                for idx, _ in batch
+            ]
+            
+            # Generate images (tail batches of a compiled model padded to
+            # the warmed-up shape, the extra images dropped)
+            batch_prompts = [prompt for _, prompt in batch]
+            if _worker["fixed_shape"]:
+                batch_prompts = pad_prompts(batch_prompts, batch_size)
+            embeds = load_embeddings(_worker["embeds_dir"], batch_prompts, device)
+            images = generate_images(_worker["pipe"], embeds, _worker["num_inference_steps"])[:len(batch)]
+            
+            # Bound the images held in memory: at most the previous sub-batch
+            # may still be waiting on the savers
+            wait([future for *_, future in saves[:-batch_size]])
+            saves.extend((idx, prompt, output_path, saver.submit(save_image, image, output_path, image_format))
+                         for (idx, prompt), output_path, image in zip(batch, output_paths, images))
+            
+        except Exception as e:
+            logger.error(f"Worker {worker_id} failed on prompts {batch[0][0]}-{batch[-1][0]}: {e}")
+            statuses.extend({
+                "worker_id": worker_id,
+                "prompt_idx": idx,
+                "prompt": prompt,
+                "success": False,
+                "error": str(e),
+                "timestamp": timestamp
+            } for idx, prompt in batch)
+    
+    # Report only once every file of this batch is on disk, so the caller
+    # never commits a half-written image
+    for idx, prompt, output_path, future in saves:
+        status = {
             "worker_id": worker_id,
-            "status": "crashed",
-            "error": str(e)
-        })
+            "prompt_idx": idx,
+            "prompt": prompt,
+            "output_path": output_path,
+            "success": True,
+            "timestamp": timestamp
+        }
+        try:
+            future.result()
+            logger.info(f"Image saved to: {output_path}")
+        except Exception as e:
+            logger.error(f"Failed to save {output_path}: {e}")
+            status.update(success=False, error=str(e))
+        statuses.append(status)
+    
+    return statuses
+
+
+def exclude_partial_files(output_dir: str):
+    """
+    Keep in-flight images out of every commit made in output_dir
+    
+    The pattern goes into .git/info/exclude rather than a pathspec, so other
+    committers in the same repository (resource_monitor.py's git add -A) skip
+    the partial files too, and nothing is added to the repository itself.
+    """
+    git_dir = Path(output_dir) / ".git"
+    if not git_dir.is_dir():
+        return
+    
+    pattern = f"*{PARTIAL_SUFFIX}"
+    exclude = git_dir / "info" / "exclude"
+    if exclude.exists() and pattern in exclude.read_text().splitlines():
+        return
+    exclude.parent.mkdir(exist_ok=True)
+    with open(exclude, "a") as f:
+        f.write(f"{pattern}\n")
 
 
 def git_commit_and_push(output_dir: str, message: str, push: bool = False):
@@ -185,33 +529,33 @@ def git_commit_and_push(output_dir: str, message: str, push: bool = False):
         message: Commit message
         push: Whether to push to remote
     """
+    def git(*args, check=True):
+        return subprocess.run(["git", "-C", output_dir, *args], check=check,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    
     try:
-        import git
-        
-        repo_path = Path(output_dir)
-        
         # Check if git repo exists
-        if not (repo_path / ".git").exists():
+        if not (Path(output_dir) / ".git").exists():
             logger.warning(f"No git repository found in {output_dir}")
             return
         
-        repo = git.Repo(repo_path)
+        # Add all new files (images still being written are excluded by
+        # exclude_partial_files)
+        git("add", "-A")
         
-        # Add all new files
-        repo.git.add(A=True)
-        
-        # Check if there are changes to commit
-        if repo.is_dirty() or repo.untracked_files:
-            repo.index.commit(message)
+        # Check if there are changes to commit (exit status 1 if the index differs)
+        if git("diff", "--cached", "--quiet", check=False).returncode:
+            git("commit", "--quiet", "-m", message)
             logger.info(f"Committed changes: {message}")
             
             if push:
-                origin = repo.remote(name='origin')
-                origin.push()
+                git("push", "--quiet", "origin")
                 logger.info("Pushed changes to remote")
         else:
             logger.info("No changes to commit")
             
+    except subprocess.CalledProcessError as e:
+        logger.error(f"Git commit/push failed: {e.stderr.strip() or e}")
     except Exception as e:
         logger.error(f"Git commit/push failed: {e}")
 
@@ -222,7 +566,14 @@ def run_generation(
     num_processes: int = 4,
     num_inference_steps: int = 4,
     git_auto_commit: bool = False,
-    git_push: bool = False
+    git_push: bool = False,
+    batch_size: int = 4,
+    commit_interval: float = 300,
+    compile_mode: Optional[str] = None,
+    quant: str = "none",
+    embeds_dir: Optional[str] = None,
+    image_format: str = "png",
+    low_vram: bool = False
 ):
     """
     Run the complete generation process with multi-process support
@@ -234,6 +585,13 @@ def run_generation(
         num_inference_steps: Number of inference steps
         git_auto_commit: Whether to auto-commit results
         git_push: Whether to push commits
+        batch_size: Maximum number of prompts per pipeline call
+        commit_interval: Minimum seconds between auto-commits during the run
+        compile_mode: torch.compile mode used in each worker, None to run eagerly
+        quant: Weight quantization: "none", "fp8" or "nf4"
+        embeds_dir: Prompt embedding cache (default: .prompt_embeds next to the prompts file)
+        image_format: Output image format: "png", "jpg" or "webp"
+        low_vram: Use sequential CPU offload in each worker
     """
     # Load prompts
     logger.info(f"Loading prompts from {prompts_file}")
@@ -244,80 +602,118 @@ def run_generation(
     
     # Create output directory
     os.makedirs(output_dir, exist_ok=True)
+    exclude_partial_files(output_dir)
     
-    # Distribute prompts across workers
-    prompts_per_worker = len(prompts) // num_processes
-    remainder = len(prompts) % num_processes
+    # Encode every prompt once, in a separate process so the text encoders'
+    # memory is released before the workers load the transformer. The cache
+    # lives outside output_dir so it is never committed with the images.
+    if embeds_dir is None:
+        embeds_dir = os.path.join(os.path.dirname(os.path.abspath(prompts_file)), ".prompt_embeds")
+    prefetch_model()
+    # CUDA cannot be re-initialized in a forked child, so all children are spawned
+    ctx = mp.get_context("spawn")
+    encoder = ctx.Process(target=encode_prompts, args=(prompts, embeds_dir, quant), name="PromptEncoder")
+    encoder.start()
+    encoder.join()
+    if encoder.exitcode != 0:
+        logger.error(f"Prompt encoding failed (exit code {encoder.exitcode})")
+        sys.exit(1)
     
-    worker_prompts = []
-    start_idx = 0
+    # One worker per GPU, each pinned to its own device; CPU-only hosts
+    # keep the requested number of processes
+    num_gpus = gpu_count()
+    if num_gpus:
+        if num_processes != num_gpus:
+            logger.info(f"Running one worker per GPU: {num_gpus} workers (requested {num_processes})")
+        num_processes = num_gpus
+        devices = [f"cuda:{i}" for i in range(num_gpus)]
+    else:
+        devices = ["cpu"] * num_processes
     
-    for i in range(num_processes):
-        # Give extra prompts to first workers if there's a remainder
-        end_idx = start_idx + prompts_per_worker + (1 if i < remainder else 0)
-        worker_prompts.append(prompts[start_idx:end_idx])
-        start_idx = end_idx
+    # Workers claim (worker ID, device) pairs from this queue as they start
+    device_queue = ctx.Queue()
+    for worker_id, device in enumerate(devices):
+        device_queue.put((worker_id, device))
     
-    # Create status queue for monitoring
-    status_queue = mp.Queue()
+    # Batches are cut from the remaining prompts as workers free up rather
+    # than all up front: at most two tasks per worker are outstanding (one
+    # running, one queued in the executor's shared call queue), and each new
+    # task takes at most 1/num_processes of what is left. Batches therefore
+    # shrink towards the end and all workers finish at about the same time.
+    # Compiled workers pad every call to the full batch size anyway, so with
+    # compile_mode set batches keep that size and only the last one is short.
+    # (All prompts are known in advance, so there is no latency window to
+    # wait on for a batch to fill.)
+    remaining = deque(enumerate(prompts))
     
-    # Start worker processes
-    processes = []
-    for worker_id in range(num_processes):
-        p = mp.Process(
-            target=worker_process,
-            args=(worker_id, worker_prompts[worker_id], output_dir, status_queue, num_inference_steps)
-        )
-        p.start()
-        processes.append(p)
-        logger.info(f"Started worker {worker_id} with {len(worker_prompts[worker_id])} prompts")
+    def next_batch():
+        share = len(remaining) if compile_mode else -(-len(remaining) // num_processes)
+        size = max(1, min(batch_size, share))
+        return [remaining.popleft() for _ in range(size)]
     
-    # Monitor status
-    completed_workers = 0
-    crashed_workers = 0
     total_images = 0
     failed_images = 0
+    failed_batches = 0
+    committed_images = 0
+    last_commit = time.monotonic()
     
     status_log = []
     
-    while completed_workers + crashed_workers < num_processes:
-        try:
-            # Get status with timeout
-            status = status_queue.get(timeout=10)
-            status_log.append(status)
+    with ProcessPoolExecutor(
+        max_workers=num_processes,
+        mp_context=ctx,
+        initializer=init_worker,
+        initargs=(device_queue, embeds_dir, prompts[:batch_size], num_inference_steps,
+                  batch_size, compile_mode, quant, image_format, low_vram)
+    ) as executor:
+        futures = {}
+        logger.info(f"Started {num_processes} workers for {len(prompts)} prompts")
+        
+        while remaining or futures:
+            while remaining and len(futures) < 2 * num_processes:
+                batch = next_batch()
+                try:
+                    futures[executor.submit(generate_batch, batch, output_dir)] = batch
+                except BrokenExecutor as e:
+                    # A worker already died, nothing more can be scheduled
+                    lost = Future()
+                    lost.set_exception(e)
+                    futures[lost] = batch + list(remaining)
+                    remaining.clear()
             
-            if status.get("status") == "completed":
-                completed_workers += 1
-                logger.info(f"Worker {status['worker_id']} completed ({completed_workers}/{num_processes})")
-            elif status.get("status") == "crashed":
-                crashed_workers += 1
-                logger.error(f"Worker {status['worker_id']} crashed: {status.get('error', 'Unknown error')}")
-            elif status.get("success") is True:
-                total_images += 1
-                logger.info(f"Generated image {total_images}: {status['output_path']}")
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                batch = futures.pop(future)
+                try:
+                    statuses = future.result()
+                except Exception as e:
+                    # The worker died (or failed to load the model); with a
+                    # broken pool every outstanding batch ends up here
+                    failed_batches += 1
+                    logger.error(f"Batch of {len(batch)} prompts lost: {e}")
+                    statuses = [{"prompt_idx": idx, "prompt": prompt, "success": False, "error": str(e)}
+                                for idx, prompt in batch]
                 
-                # Commit after each image if auto-commit enabled
-                if git_auto_commit and total_images % 5 == 0:  # Commit every 5 images
+                status_log.extend(statuses)
+                for status in statuses:
+                    if status["success"]:
+                        total_images += 1
+                        logger.info(f"Generated image {total_images}: {status['output_path']}")
+                    else:
+                        failed_images += 1
+                        logger.warning(f"Failed to generate image for prompt: {status.get('prompt', 'unknown')}")
+            
+                # Commit new images at most every commit_interval seconds if
+                # auto-commit enabled; the final commit below picks up the rest
+                if (git_auto_commit and total_images > committed_images
+                        and time.monotonic() - last_commit >= commit_interval):
                     git_commit_and_push(
                         output_dir,
                         f"Generated {total_images} images",
                         git_push
                     )
-            elif status.get("success") is False:
-                failed_images += 1
-                logger.warning(f"Failed to generate image for prompt: {status.get('prompt', 'unknown')}")
-                
-        except Exception:
-            # Timeout - check if processes are still alive
-            for i, p in enumerate(processes):
-                if not p.is_alive() and p.exitcode != 0:
-                    logger.error(f"Worker {i} died unexpectedly")
-    
-    # Wait for all processes to finish
-    for p in processes:
-        p.join(timeout=10)
-        if p.is_alive():
-            p.terminate()
+                    committed_images = total_images
+                    last_commit = time.monotonic()
     
     # Final commit
     if git_auto_commit:
@@ -338,8 +734,7 @@ def run_generation(
     logger.info(f"  Total prompts: {len(prompts)}")
     logger.info(f"  Successful: {total_images}")
     logger.info(f"  Failed: {failed_images}")
-    logger.info(f"  Workers completed: {completed_workers}")
-    logger.info(f"  Workers crashed: {crashed_workers}")
+    logger.info(f"  Batches lost to worker crashes: {failed_batches}")
     logger.info("=" * 60)
 
 
@@ -361,7 +756,7 @@ def main():
         "--num-processes",
         type=int,
         default=4,
-        help="Number of parallel processes"
+        help="Number of parallel processes on CPU-only hosts (with CUDA, one process per GPU)"
     )
     parser.add_argument(
         "--num-inference-steps",
@@ -369,11 +764,53 @@ def main():
         default=4,
         help="Number of inference steps (default 4 for schnell)"
     )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=4,
+        help="Prompts per pipeline call (capped by free VRAM)"
+    )
+    parser.add_argument(
+        "--compile",
+        nargs="?",
+        const="max-autotune",
+        choices=["default", "reduce-overhead", "max-autotune"],
+        help="Compile the model with torch.compile in the given mode (default mode: max-autotune; "
+             "adds about a minute of warm-up per worker)"
+    )
+    parser.add_argument(
+        "--quant",
+        choices=["none", "fp8", "nf4"],
+        default="none",
+        help="Quantize transformer and T5 weights (nf4 fits the pipeline in 8-12 GB)"
+    )
+    parser.add_argument(
+        "--low-vram",
+        action="store_true",
+        help="Stream weights to the GPU layer by layer (sequential CPU offload) for 6-8 GB cards"
+    )
+    parser.add_argument(
+        "--format",
+        choices=["png", "jpg", "webp"],
+        default="png",
+        help="Output image format (png uses libspng when pyspng is installed)"
+    )
+    parser.add_argument(
+        "--embeds-dir",
+        default=None,
+        help="Prompt embedding cache directory (default: .prompt_embeds next to the prompts file)"
+    )
     parser.add_argument(
         "--git-auto-commit",
         action="store_true",
         help="Automatically commit generated images to git"
     )
+    parser.add_argument(
+        "--commit-interval",
+        type=float,
+        default=300,
+        help="Minimum seconds between auto-commits while generating (default 300)"
+    )
     parser.add_argument(
         "--git-push",
         action="store_true",
@@ -394,7 +831,14 @@ def main():
         args.num_processes,
         args.num_inference_steps,
         args.git_auto_commit,
-        args.git_push
+        args.git_push,
+        args.batch_size,
+        args.commit_interval,
+        args.compile,
+        args.quant,
+        args.embeds_dir,
+        args.format,
+        args.low_vram
     )
 
 
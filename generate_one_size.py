@@ -1,16 +1,21 @@
 import os
 import json
 base_dir = "extreme_test_data"
-files = []
+
+def make_sparse(path, size):
+    # Metadata only: the file reads back as zeros without any data written
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        os.ftruncate(fd, size)
+    finally:
+        os.close(fd)
+
 os.makedirs(f"{base_dir}/test/stress/resolve/main", exist_ok=True)
-for i in range(1, 10 + 1):
-    name = f"file_64k_{i}.bin"
-    # PATH in JSON should be relative to the 'resolve/main' logic in HF
-    # hf_client.cpp expects filename relative to model root
-    rel_path = f"file_64k_{i}.bin"
-    full_path = f"{base_dir}/test/stress/resolve/main/{name}"
-    with open(full_path, "wb") as f:
-        f.write(b"\0" * (64 * 1024))
-    files.append({"type": "file", "path": rel_path, "size": 64 * 1024})
+os.makedirs(f"{base_dir}/api/models/test/stress/tree", exist_ok=True)
+# PATH in JSON should be relative to the 'resolve/main' logic in HF
+# hf_client.cpp expects filename relative to model root
+files = [{"type": "file", "path": f"file_64k_{i}.bin", "size": 64 * 1024} for i in range(1, 10 + 1)]
+for entry in files:
+    make_sparse(f"{base_dir}/test/stress/resolve/main/{entry['path']}", entry["size"])
 with open(f"{base_dir}/api/models/test/stress/tree/main", "w") as f:
     json.dump(files, f)
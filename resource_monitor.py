@@ -7,12 +7,15 @@ and commits the monitoring data to a git repository.
 """
 
 import argparse
+import atexit
 import json
 import os
+import signal
 import sys
 import time
 import logging
 from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
 from typing import Dict, List
 
@@ -24,19 +27,40 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+@lru_cache(maxsize=None)
+def get_cpu_count() -> int:
+    """Logical CPU count (fixed for the life of the process)"""
+    import psutil
+    return psutil.cpu_count()
+
+
+def prime_cpu_percent():
+    """Start psutil's CPU usage counters so later samples are meaningful"""
+    try:
+        import psutil
+        psutil.cpu_percent(interval=None, percpu=True)
+    except Exception as e:
+        logger.error(f"Failed to prime CPU counters: {e}")
+    # Per-process counters start on a process's first sample
+    get_process_info()
+
+
 def get_cpu_info() -> Dict:
-    """Get CPU usage information"""
+    """Get CPU usage information since the previous call"""
     try:
         import psutil
         
-        cpu_percent = psutil.cpu_percent(interval=1, percpu=True)
-        cpu_count = psutil.cpu_count()
+        # Non-blocking: usage is measured since the previous sample, i.e.
+        # over the whole monitoring interval, instead of sleeping two extra
+        # seconds per tick to take two back-to-back samples
+        cpu_percent = psutil.cpu_percent(interval=None, percpu=True)
+        cpu_freq = psutil.cpu_freq()
         
         return {
-            "cpu_percent_total": psutil.cpu_percent(interval=1),
+            "cpu_percent_total": sum(cpu_percent) / len(cpu_percent) if cpu_percent else 0.0,
             "cpu_percent_per_core": cpu_percent,
-            "cpu_count": cpu_count,
-            "cpu_freq": psutil.cpu_freq()._asdict() if psutil.cpu_freq() else None
+            "cpu_count": get_cpu_count(),
+            "cpu_freq": cpu_freq._asdict() if cpu_freq else None
         }
     except Exception as e:
         logger.error(f"Failed to get CPU info: {e}")
@@ -83,77 +107,130 @@ def get_disk_info() -> Dict:
         return {}
 
 
+@lru_cache(maxsize=None)
+def get_nvml():
+    """Initialize NVML once; returns the pynvml module, or None if unavailable"""
+    try:
+        import pynvml
+        pynvml.nvmlInit()
+    except Exception as e:
+        logger.info(f"NVML not available ({e}), falling back to nvidia-smi")
+        return None
+    
+    atexit.register(pynvml.nvmlShutdown)
+    return pynvml
+
+
 def get_gpu_info() -> List[Dict]:
     """Get GPU usage information"""
-    try:
-        import torch
-        
-        if not torch.cuda.is_available():
-            return []
-        
-        gpu_info = []
-        for i in range(torch.cuda.device_count()):
-            gpu_info.append({
-                "id": i,
-                "name": torch.cuda.get_device_name(i),
-                "memory_allocated_gb": torch.cuda.memory_allocated(i) / (1024**3),
-                "memory_reserved_gb": torch.cuda.memory_reserved(i) / (1024**3),
-                "memory_total_gb": torch.cuda.get_device_properties(i).total_memory / (1024**3)
-            })
-        
-        return gpu_info
-        
-    except ImportError:
-        # Try nvidia-smi as fallback
+    # Device-wide numbers come from NVML; torch.cuda.memory_allocated would
+    # only report this monitor process's own (empty) allocations
+    pynvml = get_nvml()
+    if pynvml is not None:
         try:
-            import subprocess
-            result = subprocess.run(
-                ["nvidia-smi", "--query-gpu=index,name,memory.used,memory.total,utilization.gpu", "--format=csv,noheader,nounits"],
-                capture_output=True,
-                text=True
-            )
-            
-            if result.returncode == 0:
-                gpu_info = []
-                for line in result.stdout.strip().split('\n'):
-                    if line:
-                        parts = [p.strip() for p in line.split(',')]
-                        if len(parts) >= 5:
-                            gpu_info.append({
-                                "id": int(parts[0]),
-                                "name": parts[1],
-                                "memory_used_mb": float(parts[2]),
-                                "memory_total_mb": float(parts[3]),
-                                "utilization_percent": float(parts[4])
-                            })
-                return gpu_info
+            gpu_info = []
+            for i in range(pynvml.nvmlDeviceGetCount()):
+                handle = pynvml.nvmlDeviceGetHandleByIndex(i)
+                name = pynvml.nvmlDeviceGetName(handle)
+                mem = pynvml.nvmlDeviceGetMemoryInfo(handle)
+                gpu_info.append({
+                    "id": i,
+                    "name": name.decode() if isinstance(name, bytes) else name,
+                    "memory_used_mb": mem.used / (1024**2),
+                    "memory_total_mb": mem.total / (1024**2),
+                    "utilization_percent": float(pynvml.nvmlDeviceGetUtilizationRates(handle).gpu)
+                })
+            return gpu_info
         except Exception as e:
-            logger.warning(f"Failed to get GPU info via nvidia-smi: {e}")
+            logger.error(f"Failed to get GPU info via NVML: {e}")
+            return []
+    
+    # Try nvidia-smi as fallback
+    try:
+        import subprocess
+        result = subprocess.run(
+            ["nvidia-smi", "--query-gpu=index,name,memory.used,memory.total,utilization.gpu", "--format=csv,noheader,nounits"],
+            capture_output=True,
+            text=True
+        )
+        
+        if result.returncode == 0:
+            gpu_info = []
+            for line in result.stdout.strip().split('\n'):
+                if line:
+                    parts = [p.strip() for p in line.split(',')]
+                    if len(parts) >= 5:
+                        gpu_info.append({
+                            "id": int(parts[0]),
+                            "name": parts[1],
+                            "memory_used_mb": float(parts[2]),
+                            "memory_total_mb": float(parts[3]),
+                            "utilization_percent": float(parts[4])
+                        })
+            return gpu_info
+    except FileNotFoundError:
+        pass
     except Exception as e:
-        logger.error(f"Failed to get GPU info: {e}")
+        logger.warning(f"Failed to get GPU info via nvidia-smi: {e}")
     
     return []
 
 
+# psutil.Process objects of the Python processes seen so far, kept across
+# ticks so cpu_percent() covers the time since the previous sample
+_tracked_processes = {}
+
+
+def iter_python_pids():
+    """Yield (pid, name) of processes whose name contains 'python', from /proc/<pid>/comm"""
+    for entry in os.scandir('/proc'):
+        if not entry.name.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry.name}/comm', 'rb') as f:
+                comm = f.read().strip()
+        except OSError:
+            continue
+        if b'python' in comm.lower():
+            yield int(entry.name), comm.decode(errors='replace')
+
+
 def get_process_info() -> List[Dict]:
     """Get information about running processes"""
     try:
         import psutil
         
+        # Filter for Python processes that might be our generators before
+        # touching psutil at all; without /proc fall back to process_iter
+        if os.path.isdir('/proc'):
+            candidates = iter_python_pids()
+        else:
+            candidates = ((proc.pid, proc.info['name']) for proc in psutil.process_iter(['name'])
+                          if 'python' in (proc.info['name'] or '').lower())
+        
         processes = []
-        for proc in psutil.process_iter(['pid', 'name', 'cpu_percent', 'memory_percent']):
+        alive = {}
+        for pid, name in candidates:
             try:
-                # Filter for Python processes that might be our generators
-                if 'python' in proc.info['name'].lower():
-                    processes.append({
-                        "pid": proc.info['pid'],
-                        "name": proc.info['name'],
-                        "cpu_percent": proc.info['cpu_percent'],
-                        "memory_percent": proc.info['memory_percent']
-                    })
+                proc = _tracked_processes.get(pid)
+                if proc is None or not proc.is_running():
+                    # First sample for this process only starts its CPU counter
+                    proc = psutil.Process(pid)
+                    proc.cpu_percent(interval=None)
+                processes.append({
+                    "pid": pid,
+                    "name": name,
+                    "cpu_percent": proc.cpu_percent(interval=None),
+                    "memory_percent": proc.memory_percent()
+                })
+                alive[pid] = proc
             except (psutil.NoSuchProcess, psutil.AccessDenied):
                 pass
         
+        # Forget processes that have exited
+        _tracked_processes.clear()
+        _tracked_processes.update(alive)
+        
         return processes
     except Exception as e:
         logger.error(f"Failed to get process info: {e}")
@@ -176,78 +253,70 @@ def collect_metrics() -> Dict:
     return metrics
 
 
-def save_metrics(metrics: Dict, output_dir: str):
-    """Save metrics to JSON file"""
+TIMESERIES_HEADER = (
+    "timestamp,cpu_percent,memory_percent,disk_percent,"
+    "gpu_count,gpu_memory_used_gb,gpu_utilization_percent\n"
+)
+
+
+def format_timeseries_row(metrics: Dict) -> str:
+    """Format the summary CSV row for one sample"""
+    # Calculate GPU totals
+    gpu_count = len(metrics.get("gpu", []))
+    # Sum GPU memory in GB
+    gpu_memory_used = sum(
+        gpu.get("memory_used_mb", 0) / 1024.0  # NVML / nvidia-smi in MB, convert to GB
+        for gpu in metrics.get("gpu", [])
+    )
+    gpu_util = sum(gpu.get("utilization_percent", 0) for gpu in metrics.get("gpu", [])) / max(gpu_count, 1)
+    
+    return (
+        f"{metrics['timestamp']},"
+        f"{metrics.get('cpu', {}).get('cpu_percent_total', 0)},"
+        f"{metrics.get('memory', {}).get('percent', 0)},"
+        f"{metrics.get('disk', {}).get('percent', 0)},"
+        f"{gpu_count},{round(gpu_memory_used, 2)},{round(gpu_util, 2)}\n"
+    )
+
+
+def append_bytes(path: str, data: bytes, header: bytes = b""):
+    """Append data to path with O_APPEND, writing header first if the file is new"""
+    fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
     try:
-        os.makedirs(output_dir, exist_ok=True)
-        
-        # Create filename with timestamp
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"metrics_{timestamp}.json"
-        filepath = os.path.join(output_dir, filename)
-        
-        # Save metrics
-        with open(filepath, 'w') as f:
-            json.dump(metrics, f, indent=2)
-        
-        logger.info(f"Saved metrics to {filepath}")
-        return filepath
-        
-    except Exception as e:
-        logger.error(f"Failed to save metrics: {e}")
-        return None
+        if header and os.fstat(fd).st_size == 0:
+            data = header + data
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view):]
+    finally:
+        os.close(fd)
 
 
-def append_to_timeseries(metrics: Dict, output_dir: str):
-    """Append metrics to a timeseries CSV file"""
+def flush_metrics(pending: List[Dict], output_dir: str):
+    """
+    Append buffered samples to the two append-only logs and clear the buffer
+    
+    metrics.jsonl holds every sample in full (one JSON object per line) and
+    resource_timeseries.csv the one-line summaries, so the monitor keeps two
+    files open-for-append instead of creating a new JSON file per tick.
+    """
+    if not pending:
+        return
     try:
-        import csv
-        
-        csv_file = os.path.join(output_dir, "resource_timeseries.csv")
-        
-        # Check if file exists to determine if we need header
-        file_exists = os.path.exists(csv_file)
-        
-        with open(csv_file, 'a', newline='') as f:
-            writer = csv.writer(f)
-            
-            # Write header if new file
-            if not file_exists:
-                writer.writerow([
-                    "timestamp",
-                    "cpu_percent",
-                    "memory_percent",
-                    "disk_percent",
-                    "gpu_count",
-                    "gpu_memory_used_gb",
-                    "gpu_utilization_percent"
-                ])
-            
-            # Calculate GPU totals
-            gpu_count = len(metrics.get("gpu", []))
-            # Sum GPU memory in GB (converting MB to GB if needed)
-            gpu_memory_used = sum(
-                gpu.get("memory_allocated_gb", 0) or  # PyTorch in GB
-                (gpu.get("memory_used_mb", 0) / 1024.0)  # nvidia-smi in MB, convert to GB
-                for gpu in metrics.get("gpu", [])
-            )
-            gpu_util = sum(gpu.get("utilization_percent", 0) for gpu in metrics.get("gpu", [])) / max(gpu_count, 1)
-            
-            # Write data row
-            writer.writerow([
-                metrics["timestamp"],
-                metrics.get("cpu", {}).get("cpu_percent_total", 0),
-                metrics.get("memory", {}).get("percent", 0),
-                metrics.get("disk", {}).get("percent", 0),
-                gpu_count,
-                round(gpu_memory_used, 2),
-                round(gpu_util, 2)
-            ])
-        
-        logger.debug(f"Appended metrics to {csv_file}")
+        append_bytes(
+            os.path.join(output_dir, "metrics.jsonl"),
+            "".join(json.dumps(m) + "\n" for m in pending).encode()
+        )
+        append_bytes(
+            os.path.join(output_dir, "resource_timeseries.csv"),
+            "".join(format_timeseries_row(m) for m in pending).encode(),
+            TIMESERIES_HEADER.encode()
+        )
+        logger.debug(f"Flushed {len(pending)} samples to {output_dir}")
         
     except Exception as e:
-        logger.error(f"Failed to append to timeseries: {e}")
+        logger.error(f"Failed to write metrics: {e}")
+    pending.clear()
 
 
 def git_commit_and_push(output_dir: str, message: str, push: bool = False):
@@ -288,7 +357,8 @@ def monitor_resources(
     interval: int = 60,
     git_auto_commit: bool = False,
     git_push: bool = False,
-    duration: int = None
+    duration: int = None,
+    flush_every: int = 10
 ):
     """
     Monitor resources and save metrics periodically
@@ -299,13 +369,20 @@ def monitor_resources(
         git_auto_commit: Whether to auto-commit metrics
         git_push: Whether to push commits
         duration: Total monitoring duration in seconds (None for infinite)
+        flush_every: Samples buffered in memory between writes
     """
     logger.info(f"Starting resource monitoring (interval: {interval}s)")
     
     os.makedirs(output_dir, exist_ok=True)
+    prime_cpu_percent()
+    
+    # The orchestrator stops the monitor with SIGTERM; by default that skips
+    # the finally below, losing the buffered samples and the final commit
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
     
     start_time = time.time()
     iteration = 0
+    pending = []
     
     try:
         while True:
@@ -316,17 +393,17 @@ def monitor_resources(
             
             # Collect metrics
             metrics = collect_metrics()
-            
-            # Save to file
-            save_metrics(metrics, output_dir)
-            
-            # Append to timeseries
-            append_to_timeseries(metrics, output_dir)
+            pending.append(metrics)
             
             iteration += 1
             
+            # Write buffered samples in one append per file
+            if len(pending) >= flush_every:
+                flush_metrics(pending, output_dir)
+            
             # Commit periodically (every 10 iterations)
             if git_auto_commit and iteration % 10 == 0:
+                flush_metrics(pending, output_dir)
                 git_commit_and_push(
                     output_dir,
                     f"Resource metrics update (iteration {iteration})",
@@ -349,9 +426,13 @@ def monitor_resources(
             
     except KeyboardInterrupt:
         logger.info("Monitoring stopped by user")
+    except SystemExit:
+        logger.info("Monitoring stopped (SIGTERM)")
     except Exception as e:
         logger.error(f"Monitoring error: {e}", exc_info=True)
     finally:
+        flush_metrics(pending, output_dir)
+        
         # Final commit
         if git_auto_commit:
             git_commit_and_push(
@@ -383,6 +464,12 @@ def main():
         type=int,
         help="Total monitoring duration in seconds (default: infinite)"
     )
+    parser.add_argument(
+        "--flush-every",
+        type=int,
+        default=10,
+        help="Number of samples buffered in memory between writes"
+    )
     parser.add_argument(
         "--git-auto-commit",
         action="store_true",
@@ -402,7 +489,8 @@ def main():
         args.interval,
         args.git_auto_commit,
         args.git_push,
-        args.duration
+        args.duration,
+        args.flush_every
     )
 
 
@@ -0,0 +1,101 @@
+import os
+import subprocess
+from contextlib import contextmanager
+
+# Data shared by benchmark_local.py and benchmark_buffer.py: both serve the
+# same 5GB file from the same tree, so it is generated once for either
+DATA_DIR = "benchmark_local_data"
+DATA_FILE = os.path.join(DATA_DIR, "test/model/large_file.bin")
+DATA_SIZE_GB = 5
+API_DIR = os.path.join(DATA_DIR, "api/models/test/model/tree")
+# Written last by setup_benchmark; holds the data size it was created for
+READY_STAMP = os.path.join(DATA_DIR, ".benchmark_ready")
+
+BLOCK_SIZE = 64 << 20
+
+def generate_random_data(filename, size_gb):
+    print(f"Generating {size_gb}GB of random data in {filename}...")
+    size = size_gb * 1024 * 1024 * 1024
+    fd = os.open(filename, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        # In-process instead of spawning dd: the kernel copies /dev/urandom
+        # into the file via sendfile (copy_file_range rejects character
+        # devices, so it is no use here)
+        written = 0
+        try:
+            with open("/dev/urandom", "rb", buffering=0) as src:
+                while written < size:
+                    sent = os.sendfile(fd, src.fileno(), None, min(1 << 30, size - written))
+                    if not sent:
+                        break
+                    written += sent
+        except (AttributeError, OSError):
+            pass
+        if written < size:
+            # Fallback to python: the data only has to be incompressible,
+            # not cryptographically random, so one 64MB block from a fast
+            # PRNG is written repeatedly for the rest
+            try:
+                import numpy as np
+                block = np.random.default_rng().bytes(BLOCK_SIZE)
+            except ImportError:
+                block = os.urandom(BLOCK_SIZE)
+            view = memoryview(block)
+            os.lseek(fd, written, os.SEEK_SET)
+            while written < size:
+                written += os.write(fd, view[:min(len(block), size - written)])
+    finally:
+        os.close(fd)
+
+def default_scratch_dir(needed_bytes):
+    # tmpfs keeps the download off the disk being measured, but only when it
+    # can actually hold it: /dev/shm is capped (half of RAM by default) and
+    # its pages compete with everything else for memory. None means the
+    # system temp dir, i.e. disk.
+    try:
+        st = os.statvfs("/dev/shm")
+    except (AttributeError, OSError):
+        return None
+    free = st.f_bavail * st.f_frsize
+    try:
+        free = min(free, os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE"))
+    except (AttributeError, ValueError, OSError):
+        pass
+    # Leave headroom for the server's page cache and the rest of the system
+    return "/dev/shm" if free > needed_bytes * 1.25 else None
+
+def setup_benchmark():
+    size = DATA_SIZE_GB * 1024 * 1024 * 1024
+    # Skip all setup IO when a previous run completed it for the same size
+    try:
+        with open(READY_STAMP) as f:
+            if f.read().strip() == str(size) and os.path.getsize(DATA_FILE) == size:
+                return
+    except (OSError, ValueError):
+        pass
+
+    os.makedirs(os.path.join(DATA_DIR, "test/model/resolve/main"), exist_ok=True)
+    os.makedirs(API_DIR, exist_ok=True)
+
+    # 1. Generate 5GB file
+    if not os.path.exists(DATA_FILE) or os.path.getsize(DATA_FILE) != size:
+        generate_random_data(DATA_FILE, DATA_SIZE_GB)
+
+    # 2. Create mock API response
+    api_json = os.path.join(API_DIR, "main?recursive=true")
+    with open(api_json, "w") as f:
+        f.write(f'[{{"type": "file", "path": "large_file.bin", "size": {size}}}]')
+
+    with open(READY_STAMP, "w") as f:
+        f.write(str(size))
+
+@contextmanager
+def running_server(cmd):
+    # The mock server is terminated however the benchmark exits, so a failed
+    # run does not leave it holding the port. Its output is discarded: an
+    # unread pipe would eventually block the server on its request log.
+    with subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL) as server_process:
+        try:
+            yield server_process
+        finally:
+            server_process.terminate()
@@ -1,26 +1,41 @@
+import json
 import subprocess
+import tempfile
 import time
 import os
-import shutil
+import urllib.request
 import numpy as np
 from scipy import stats
 import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+from _bench_common import default_scratch_dir
 
 def run_hfdown(binary, model_id, output_dir, mirror, threads=None):
     cmd = [binary, "download", model_id, output_dir, "--mirror", mirror]
     if threads:
         cmd.extend(["--threads", str(threads)])
     
-    start = time.time()
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    end = time.time()
+    # Only stderr is kept, and only decoded when the run fails
+    start = time.perf_counter_ns()
+    result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    end = time.perf_counter_ns()
     
     if result.returncode != 0:
         print(f"Error running {binary}:")
-        print(f"STDOUT: {result.stdout}")
-        print(f"STDERR: {result.stderr}")
+        print(f"STDERR: {result.stderr.decode(errors='replace')}")
+        return None
+    return (end - start) / 1e9
+
+def model_size(mirror, model_id):
+    # Bytes of one download according to the mirror's tree listing, or None
+    # if the mirror cannot be asked
+    try:
+        with urllib.request.urlopen(f"{mirror}/api/models/{model_id}/tree/main?recursive=true",
+                                    timeout=10) as r:
+            return sum(entry.get("size", 0) for entry in json.load(r))
+    except (OSError, ValueError, AttributeError):
         return None
-    return end - start
 
 def main():
     parser = argparse.ArgumentParser()
@@ -29,8 +44,23 @@ def main():
     parser.add_argument("--mirror", default="http://localhost:8891")
     parser.add_argument("--iterations", type=int, default=10)
     parser.add_argument("--compare-threads", type=int, nargs=2, default=[1, 4])
+    parser.add_argument("--scratch-dir",
+                        help="Where per-run download directories are created (default: tmpfs if it "
+                             "can hold --parallel downloads at once, otherwise the system temp dir)")
+    parser.add_argument("--parallel", type=int, default=1,
+                        help="Run this many trials concurrently (measures contended throughput, not latency)")
     args = parser.parse_args()
 
+    if args.scratch_dir is None:
+        # Up to --parallel trials hold a full download each at the same time
+        size = model_size(args.mirror, args.model_id)
+        if size is not None:
+            args.scratch_dir = default_scratch_dir(size * max(1, args.parallel))
+
+    if args.parallel > 1:
+        print(f"WARNING: running {args.parallel} trials concurrently; timings reflect contended "
+              f"throughput against the mirror, not single-download latency.")
+
     results = {}
 
     for threads in args.compare_threads:
@@ -38,23 +68,26 @@ def main():
         
         # Warmup
         print("  Warmup run...")
-        run_hfdown(args.binary, args.model_id, "test_warmup", args.mirror, threads=threads)
-        if os.path.exists("test_warmup"):
-            shutil.rmtree("test_warmup")
+        with tempfile.TemporaryDirectory(dir=args.scratch_dir) as td:
+            run_hfdown(args.binary, args.model_id, os.path.join(td, "warmup"), args.mirror, threads=threads)
+
+        def run_trial(i, threads=threads):
+            # A fresh scratch directory per trial: nothing to clear beforehand,
+            # and cleanup is a single tree removal when the context exits
+            with tempfile.TemporaryDirectory(dir=args.scratch_dir) as td:
+                output_dir = os.path.join(td, f"test_download_t{threads}_{i}")
+                return run_hfdown(args.binary, args.model_id, output_dir, args.mirror, threads=threads)
+
+        # Trials are independent external processes, so threads are enough
+        # to overlap them
+        with ThreadPoolExecutor(max_workers=max(1, args.parallel)) as ex:
+            trial_times = list(ex.map(run_trial, range(args.iterations)))
 
         times = []
-        for i in range(args.iterations):
-            output_dir = f"test_download_t{threads}_{i}"
-            if os.path.exists(output_dir):
-                shutil.rmtree(output_dir)
-            
-            t = run_hfdown(args.binary, args.model_id, output_dir, args.mirror, threads=threads)
+        for i, t in enumerate(trial_times):
             if t is not None:
                 times.append(t)
                 print(f"  Trial {i+1}: {t:.3f}s")
-            
-            if os.path.exists(output_dir):
-                shutil.rmtree(output_dir)
         
         results[threads] = times
 
@@ -67,18 +100,32 @@ def main():
         print("Benchmarking failed for one or more configurations.")
         return
 
-    m1, s1 = np.mean(times1), np.std(times1)
-    m2, s2 = np.mean(times2), np.std(times2)
+    times1 = np.asarray(times1)
+    times2 = np.asarray(times2)
+    m1, s1 = times1.mean(), times1.std(ddof=1) if len(times1) > 1 else 0.0
+    m2, s2 = times2.mean(), times2.std(ddof=1) if len(times2) > 1 else 0.0
 
     print(f"\nResults Summary:")
     print(f"Threads {t1}: Mean = {m1:.3f}s, StdDev = {s1:.3f}s")
     print(f"Threads {t2}: Mean = {m2:.3f}s, StdDev = {s2:.3f}s")
 
-    t_stat, p_val = stats.ttest_ind(times1, times2)
-    print(f"\nT-Test Comparison ({t1} threads vs {t2} threads):")
+    # Welch's t-test: variances differ across thread counts, so the
+    # equal-variance Student test is not appropriate
+    t_stat, p_val = stats.ttest_ind(times1, times2, equal_var=False)
+    print(f"\nWelch T-Test Comparison ({t1} threads vs {t2} threads):")
     print(f"T-statistic: {t_stat:.4f}")
     print(f"P-value: {p_val:.4f}")
 
+    # Non-parametric check, robust to outlier trials
+    u_stat, u_p = stats.mannwhitneyu(times1, times2, alternative="two-sided")
+    print(f"Mann-Whitney U: {u_stat:.1f} (p = {u_p:.4f})")
+
+    # Effect size, so a significant but tiny difference is not overstated
+    n1, n2 = len(times1), len(times2)
+    pooled_sd = np.sqrt(((n1 - 1) * s1**2 + (n2 - 1) * s2**2) / (n1 + n2 - 2)) if n1 + n2 > 2 else 0.0
+    if pooled_sd > 0:
+        print(f"Cohen's d: {(m1 - m2) / pooled_sd:.3f}")
+
     if p_val < 0.05:
         improvement = (m1 - m2) / m1 * 100
         print(f"Status: Statistically significant difference found!")
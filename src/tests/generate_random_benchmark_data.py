@@ -4,17 +4,31 @@ import json
 import argparse
 
 
+BLOCK_SIZE = 64 << 20
+
+
 def generate_file(path, size_mb, random_data=False):
-    chunk_size = 1024 * 1024  # 1MB chunks
-    with open(path, "wb") as f:
+    size = int(size_mb * 1024 * 1024)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
         if random_data:
-            remaining = int(size_mb * 1024 * 1024)
-            while remaining > 0:
-                to_write = min(remaining, chunk_size)
-                f.write(os.urandom(to_write))
-                remaining -= to_write
+            # Benchmark payloads only need to be incompressible: one block
+            # from NumPy's PRNG (or urandom without NumPy) is written
+            # repeatedly rather than 1MB of urandom per loop iteration
+            try:
+                import numpy as np
+                block = np.random.default_rng().bytes(min(size, BLOCK_SIZE))
+            except ImportError:
+                block = os.urandom(min(size, BLOCK_SIZE))
+            view = memoryview(block)
+            written = 0
+            while written < size:
+                written += os.write(fd, view[:min(len(block), size - written)])
         else:
-            f.truncate(int(size_mb * 1024 * 1024))
+            # Sparse file: no data blocks are written at all
+            os.ftruncate(fd, size)
+    finally:
+        os.close(fd)
 
 
 def main():
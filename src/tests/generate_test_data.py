@@ -2,16 +2,38 @@ import os
 import random
 import argparse
 import json
+import multiprocessing as mp
 
-def generate_random_file(path, size):
-    with open(path, 'wb') as f:
-        f.write(os.urandom(size))
+def generate_random_file(path, size, chunk=1 << 20):
+    # Stream random bytes instead of building the whole file in memory:
+    # the kernel copies /dev/urandom straight into the file via sendfile
+    # where supported, otherwise 1MB chunks are written one at a time
+    with open(path, 'wb', buffering=0) as dst:
+        try:
+            with open('/dev/urandom', 'rb', buffering=0) as src:
+                offset = 0
+                while offset < size:
+                    sent = os.sendfile(dst.fileno(), src.fileno(), None, min(chunk, size - offset))
+                    if sent == 0:
+                        break
+                    offset += sent
+                if offset == size:
+                    return
+        except (AttributeError, OSError):
+            offset = 0
+        dst.seek(offset)
+        remaining = size - offset
+        while remaining:
+            n = min(chunk, remaining)
+            dst.write(os.urandom(n))
+            remaining -= n
 
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--dir", default="test_server_data")
     parser.add_argument("--small", type=int, default=50)
     parser.add_argument("--large", type=int, default=5)
+    parser.add_argument("--jobs", type=int, default=os.cpu_count(), help="Files generated in parallel")
     args = parser.parse_args()
 
     model_id = "test/random-model"
@@ -24,16 +46,19 @@ def main():
     for i in range(args.small):
         filename = f"small_file_{i}.txt"
         size = random.randint(1024, 100 * 1024)
-        generate_random_file(os.path.join(model_dir, filename), size)
         files_info.append({"path": filename, "type": "file", "size": size, "oid": f"oid_small_{i}"})
 
     # Large files (10MB - 100MB)
     for i in range(args.large):
         filename = f"large_weight_{i}.bin"
         size = random.randint(10 * 1024 * 1024, 100 * 1024 * 1024)
-        generate_random_file(os.path.join(model_dir, filename), size)
         files_info.append({"path": filename, "type": "file", "size": size, "oid": f"oid_large_{i}"})
 
+    # Sizes are drawn above in order; only the writing is spread over processes
+    with mp.Pool(args.jobs) as pool:
+        pool.starmap(generate_random_file,
+                     [(os.path.join(model_dir, info["path"]), info["size"]) for info in files_info])
+
     # Save API metadata
     api_dir = os.path.join(args.dir, "api", "models", model_id, "tree")
     os.makedirs(api_dir, exist_ok=True)
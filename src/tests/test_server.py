@@ -1,23 +1,122 @@
 import http.server
+import socket
 import socketserver
 import os
 import sys
+import threading
+from functools import lru_cache
 
 PORT = 8891
 DATA_DIR = sys.argv[1] if len(sys.argv) > 1 else "test_server_data"
 
+# URL path -> body of every pre-generated API response under DATA_DIR/api,
+# filled once at startup by load_api_responses()
+_API_TREE_JSON = {}
+# URL path -> memfd holding the same body (Linux), sent with sendfile so the
+# API path does no filesystem I/O and no userspace copy
+_API_TREE_MEMFD = {}
+
+def load_api_responses(data_dir):
+    api_root = os.path.join(data_dir, "api")
+    for dirpath, _, names in os.walk(api_root):
+        for name in names:
+            path = os.path.join(dirpath, name)
+            url = "/" + os.path.relpath(path, data_dir).replace(os.sep, "/")
+            with open(path, "rb") as f:
+                body = _API_TREE_JSON[url] = f.read()
+            if hasattr(os, "memfd_create"):
+                fd = os.memfd_create("api" + url.replace("/", "_"))
+                os.write(fd, body)
+                _API_TREE_MEMFD[url] = fd
+
+def advise_sequential(fd, offset, length):
+    # The range is read front to back exactly once: widen readahead and
+    # start paging it in before sendfile asks for it (no-op on macOS)
+    if hasattr(os, "posix_fadvise"):
+        os.posix_fadvise(fd, offset, length, os.POSIX_FADV_SEQUENTIAL)
+        os.posix_fadvise(fd, offset, length, os.POSIX_FADV_WILLNEED)
+
+# Test data does not change while the server runs, so each file is stat'ed once
+_FILE_SIZES = {}
+
+def file_size(path):
+    # None unless path is a regular file
+    size = _FILE_SIZES.get(path)
+    if size is None and os.path.isfile(path):
+        size = _FILE_SIZES[path] = os.path.getsize(path)
+    return size
+
+def parse_range(value, size):
+    # "bytes=<start>-[<end>]" -> (start, end), or None if malformed
+    start, sep, end = value[6:].partition("-")
+    if not sep or not start.isdigit() or (end and not end.isdigit()):
+        return None
+    start = int(start)
+    end = int(end) if end else size - 1
+    return (start, end) if start <= end else None
+
+@lru_cache(maxsize=4096)
+def resolve_hf_path(path, data_dir, cwd):
+    # Cached outside the handler (a new handler is built per connection);
+    # test data is static, so entries never need invalidating.
+    # Returns None for paths that are not HuggingFace-style.
+
+    # HuggingFace API: /api/models/<model_id>/tree/main
+    if path.startswith("/api/models/"):
+        # Redirect to the pre-generated JSON file
+        # Path: test_server_data/api/models/<model_id>/tree/main
+        return os.path.join(cwd, data_dir, path.lstrip("/"))
+    
+    # HuggingFace Resolve: /<model_id>/resolve/main/<filename>
+    # We simplify this to look for <model_id>/<filename> in DATA_DIR
+    parts = path.lstrip("/").split("/")
+    if "resolve" in parts:
+        idx = parts.index("resolve")
+        model_id = "/".join(parts[:idx])
+        filename = "/".join(parts[idx+2:])
+        return os.path.join(cwd, data_dir, model_id, filename)
+    
+    return None
+
+# One copy buffer per server thread, reused across requests
+_local = threading.local()
+
+def copy_buffer():
+    mv = getattr(_local, "buf", None)
+    if mv is None:
+        mv = _local.buf = memoryview(bytearray(65536))
+    return mv
+
 class MockHFHandler(http.server.SimpleHTTPRequestHandler):
     def do_GET(self):
+        # Tree listings come from memory; a query the file name does not
+        # encode (e.g. ?recursive=true) still finds the plain listing
+        if self.path.startswith("/api/models/"):
+            key = self.path if self.path in _API_TREE_JSON else self.path.partition("?")[0]
+            body = _API_TREE_JSON.get(key)
+            if body is not None:
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                fd = _API_TREE_MEMFD.get(key)
+                if fd is None:
+                    self.wfile.write(body)
+                else:
+                    offset = 0
+                    while offset < len(body):
+                        offset += os.sendfile(self.connection.fileno(), fd, offset, len(body) - offset)
+                return
+
         # Handle Range header manually for better compatibility
         range_header = self.headers.get("Range")
-        if range_header and "resolve" in self.path:
+        if range_header and range_header.startswith("bytes=") and "resolve" in self.path:
             path = self.translate_path(self.path)
-            if os.path.exists(path) and os.path.isfile(path):
-                size = os.path.getsize(path)
+            size = file_size(path)
+            byte_range = parse_range(range_header, size) if size is not None else None
+            if byte_range:
+                start, end = byte_range
                 try:
-                    parts = range_header.replace("bytes=", "").split("-")
-                    start = int(parts[0])
-                    end = int(parts[1]) if parts[1] else size - 1
                     length = end - start + 1
                     
                     self.send_response(206)
@@ -28,13 +127,28 @@ class MockHFHandler(http.server.SimpleHTTPRequestHandler):
                     self.end_headers()
                     
                     with open(path, "rb") as f:
-                        f.seek(start)
+                        advise_sequential(f.fileno(), start, length)
+                        offset = start
                         remaining = length
+                        # Zero-copy: the kernel moves the range from the page
+                        # cache straight into the socket
+                        try:
+                            while remaining > 0:
+                                sent = os.sendfile(self.connection.fileno(), f.fileno(), offset, remaining)
+                                if not sent: break
+                                offset += sent
+                                remaining -= sent
+                        except (AttributeError, OSError):
+                            # No sendfile for this file/socket pair; copy the
+                            # rest through Python
+                            pass
+                        f.seek(offset)
+                        mv = copy_buffer()
                         while remaining > 0:
-                            chunk = f.read(min(remaining, 65536))
-                            if not chunk: break
-                            self.wfile.write(chunk)
-                            remaining -= len(chunk)
+                            n = f.readinto(mv if remaining >= len(mv) else mv[:remaining])
+                            if not n: break
+                            self.wfile.write(mv[:n])
+                            remaining -= n
                     return
                 except Exception as e:
                     print(f"Error handling range: {e}")
@@ -42,32 +156,39 @@ class MockHFHandler(http.server.SimpleHTTPRequestHandler):
         return super().do_GET()
 
     def translate_path(self, path):
-        # HuggingFace API: /api/models/<model_id>/tree/main
-        if path.startswith("/api/models/"):
-            # Redirect to the pre-generated JSON file
-            # Path: test_server_data/api/models/<model_id>/tree/main
-            return os.path.join(os.getcwd(), DATA_DIR, path.lstrip("/"))
-        
-        # HuggingFace Resolve: /<model_id>/resolve/main/<filename>
-        # We simplify this to look for <model_id>/<filename> in DATA_DIR
-        parts = path.lstrip("/").split("/")
-        if "resolve" in parts:
-            idx = parts.index("resolve")
-            model_id = "/".join(parts[:idx])
-            filename = "/".join(parts[idx+2:])
-            return os.path.join(os.getcwd(), DATA_DIR, model_id, filename)
-            
-        return super().translate_path(path)
+        resolved = resolve_hf_path(path, DATA_DIR, os.getcwd())
+        return resolved if resolved is not None else super().translate_path(path)
 
     def end_headers(self):
         # Add some headers to mimic real HF server
         self.send_header("Accept-Ranges", "bytes")
         super().end_headers()
 
+# Kernel default send buffers (~208KB Linux, 128KB macOS) would cap what
+# the buffer-size sweep can measure on the client side
+SEND_BUFFER_SIZE = 4 << 20
+
+def set_socket_options(sock):
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SEND_BUFFER_SIZE)
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
 class ThreadedTCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
-    pass
+    # Rapid benchmark re-runs must not trip over sockets in TIME_WAIT
+    allow_reuse_address = True
+    allow_reuse_port = True
+
+    def server_activate(self):
+        # Accepted sockets inherit these from the listener on Linux
+        set_socket_options(self.socket)
+        super().server_activate()
+
+    def finish_request(self, request, client_address):
+        # ... but not on every platform, so set them per connection too
+        set_socket_options(request)
+        super().finish_request(request, client_address)
 
 def run_server():
+    load_api_responses(os.path.join(os.getcwd(), DATA_DIR))
     Handler = MockHFHandler
     with ThreadedTCPServer(("", 0), Handler) as httpd:
         port = httpd.server_address[1]
@@ -0,0 +1,126 @@
+import asyncio
+import os
+import sys
+
+DATA_DIR = sys.argv[1] if len(sys.argv) > 1 else "test_server_data"
+
+# Single-process alternative to test_server.py: one event loop serves every
+# connection (no thread per connection) and file bodies go out through
+# loop.sendfile, which uses sendfile(2) on the socket where available.
+
+def translate_path(path):
+    # Same layout as test_server.MockHFHandler.translate_path
+    # HuggingFace API: /api/models/<model_id>/tree/main
+    if path.startswith("/api/models/"):
+        return os.path.join(os.getcwd(), DATA_DIR, path.lstrip("/"))
+
+    # HuggingFace Resolve: /<model_id>/resolve/main/<filename>
+    parts = path.split("?", 1)[0].lstrip("/").split("/")
+    if "resolve" in parts:
+        idx = parts.index("resolve")
+        model_id = "/".join(parts[:idx])
+        filename = "/".join(parts[idx+2:])
+        return os.path.join(os.getcwd(), DATA_DIR, model_id, filename)
+
+    return os.path.join(os.getcwd(), DATA_DIR, "/".join(parts))
+
+def parse_range(value, size):
+    # "bytes=<start>-[<end>]"; returns (start, end) or None if unusable
+    if not value.startswith("bytes="):
+        return None
+    start, _, end = value[6:].partition("-")
+    try:
+        start = int(start)
+        end = int(end) if end else size - 1
+    except ValueError:
+        return None
+    if start > end or start >= size:
+        return None
+    return start, min(end, size - 1)
+
+def advise_sequential(fd, offset, length):
+    # Same hint as test_server.advise_sequential (no-op on macOS)
+    if hasattr(os, "posix_fadvise"):
+        os.posix_fadvise(fd, offset, length, os.POSIX_FADV_SEQUENTIAL)
+        os.posix_fadvise(fd, offset, length, os.POSIX_FADV_WILLNEED)
+
+async def send_simple(writer, status, reason, keep_alive):
+    writer.write(f"HTTP/1.1 {status} {reason}\r\n"
+                 f"Content-Length: 0\r\n"
+                 f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode())
+    await writer.drain()
+
+async def handle(reader, writer):
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            try:
+                head = await reader.readuntil(b"\r\n\r\n")
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+                break
+            lines = head.decode("latin-1").split("\r\n")
+            try:
+                method, target, version = lines[0].split(" ", 2)
+            except ValueError:
+                break
+            headers = {}
+            for line in lines[1:]:
+                name, sep, value = line.partition(":")
+                if sep:
+                    headers[name.strip().lower()] = value.strip()
+            keep_alive = (headers.get("connection", "").lower() != "close"
+                          and version == "HTTP/1.1")
+
+            path = translate_path(target)
+            if method not in ("GET", "HEAD"):
+                await send_simple(writer, 405, "Method Not Allowed", keep_alive)
+            elif not os.path.isfile(path):
+                await send_simple(writer, 404, "Not Found", keep_alive)
+            else:
+                size = os.path.getsize(path)
+                rng = None
+                if "range" in headers and "resolve" in target:
+                    rng = parse_range(headers["range"], size)
+                if rng:
+                    start, end = rng
+                    status = "206 Partial Content"
+                    extra = f"Content-Range: bytes {start}-{end}/{size}\r\n"
+                else:
+                    start, end = 0, size - 1
+                    status = "200 OK"
+                    extra = ""
+                length = end - start + 1
+                content_type = ("application/json" if target.startswith("/api/")
+                                else "application/octet-stream")
+                writer.write(f"HTTP/1.1 {status}\r\n"
+                             f"Content-Type: {content_type}\r\n"
+                             f"Content-Length: {length}\r\n"
+                             f"Accept-Ranges: bytes\r\n"
+                             f"{extra}"
+                             f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode())
+                if method == "GET" and length > 0:
+                    with open(path, "rb") as f:
+                        advise_sequential(f.fileno(), start, length)
+                        await loop.sendfile(writer.transport, f, start, length)
+                await writer.drain()
+
+            if not keep_alive:
+                break
+    except (ConnectionError, OSError) as e:
+        print(f"Error handling request: {e}")
+    finally:
+        writer.close()
+
+async def run_server():
+    # One IPv4 listener, like the threaded server: with host "" asyncio
+    # binds IPv4 and IPv6 separately, each on its own random port
+    server = await asyncio.start_server(handle, "0.0.0.0", 0)
+    port = server.sockets[0].getsockname()[1]
+    with open("server.port", "w") as f:
+        f.write(str(port))
+    print(f"Serving Mock HF at port {port}")
+    async with server:
+        await server.serve_forever()
+
+if __name__ == "__main__":
+    asyncio.run(run_server())
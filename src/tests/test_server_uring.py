@@ -0,0 +1,284 @@
+import errno
+import fcntl
+import os
+import socket
+
+from liburing import (Cqe, CqeIter, FileIndex, IORING_CQE_F_MORE, IORING_SETUP_SQPOLL, IOSQE_IO_LINK,
+                      Ring, SPLICE_F_FD_IN_FIXED, io_uring_cq_advance,
+                      io_uring_get_sqe, io_uring_prep_multishot_accept,
+                      io_uring_prep_recv, io_uring_prep_send, io_uring_prep_splice,
+                      io_uring_queue_exit, io_uring_queue_init, io_uring_register_files,
+                      io_uring_sqe_set_data64, io_uring_sqe_set_flags, io_uring_submit,
+                      io_uring_submit_and_wait)
+
+from test_server_async import DATA_DIR, parse_range, translate_path
+
+# Linux-only variant of test_server.py on io_uring (`pip install liburing`).
+# A single thread drives one ring: every model file is opened once
+# and registered as a fixed file, connections come from one multishot accept,
+# and a Range body goes out as linked splice SQEs file -> pipe -> socket, so
+# the data never enters userspace. Everything queued while handling one
+# batch of completions is submitted with a single io_uring_enter, and with
+# SQPOLL (when the kernel allows it) submission needs no syscall at all.
+
+RING_ENTRIES = 256
+RECV_SIZE = 8192
+# Bytes moved per splice pair; the pipe is grown to match where allowed
+PIPE_SIZE = 1 << 20
+
+# Operation kind, kept in the low bits of each SQE's user_data
+OP_ACCEPT, OP_RECV, OP_SEND, OP_SPLICE_IN, OP_SPLICE_OUT = range(5)
+
+class Connection:
+    def __init__(self, fd):
+        self.fd = fd
+        self.pipe_r, self.pipe_w = os.pipe()
+        try:
+            fcntl.fcntl(self.pipe_w, fcntl.F_SETPIPE_SZ, PIPE_SIZE)
+        except (AttributeError, OSError):
+            pass
+        self.recv_buf = bytearray(RECV_SIZE)
+        self.data = b""         # request bytes received but not yet parsed
+        self.send_buf = b""     # response headers not yet sent
+        self.file_index = -1    # fixed-file slot of the body being served
+        self.offset = 0         # next file offset to splice into the pipe
+        self.to_read = 0        # body bytes not yet spliced into the pipe
+        self.in_pipe = 0        # body bytes in the pipe, not yet sent
+        self.keep_alive = True
+        self.inflight = 0       # CQEs still expected for the current step
+
+    def close(self):
+        for fd in (self.fd, self.pipe_r, self.pipe_w):
+            os.close(fd)
+
+class UringServer:
+    def __init__(self, listen_sock, files):
+        self.listen_sock = listen_sock
+        # path -> (fixed file index, size)
+        self.files = files
+        self.conns = {}
+        self.ring = Ring()
+        try:
+            io_uring_queue_init(RING_ENTRIES, self.ring, IORING_SETUP_SQPOLL)
+        except OSError:
+            # SQPOLL needs privileges on older kernels
+            io_uring_queue_init(RING_ENTRIES, self.ring)
+        self.cqe = Cqe()
+        self.fds = [os.open(path, os.O_RDONLY) for path in files]
+        if self.fds:
+            io_uring_register_files(self.ring, FileIndex(self.fds))
+
+    def get_sqe(self, fd, op, flags=0):
+        sqe = io_uring_get_sqe(self.ring)
+        if sqe is None:
+            # SQ ring full: hand what is queued to the kernel first
+            io_uring_submit(self.ring)
+            sqe = io_uring_get_sqe(self.ring)
+        io_uring_sqe_set_data64(sqe, fd << 3 | op)
+        if flags:
+            io_uring_sqe_set_flags(sqe, flags)
+        return sqe
+
+    def arm_accept(self):
+        io_uring_prep_multishot_accept(self.get_sqe(self.listen_sock.fileno(), OP_ACCEPT),
+                                       self.listen_sock.fileno())
+
+    def arm_recv(self, conn):
+        io_uring_prep_recv(self.get_sqe(conn.fd, OP_RECV), conn.fd, conn.recv_buf)
+        conn.inflight = 1
+
+    def queue_splice_in(self, conn, flags=0):
+        n = min(conn.to_read, PIPE_SIZE)
+        # SPLICE_F_FD_IN_FIXED: the input is a registered-file index (the
+        # pipe end is a plain fd, so no IOSQE_FIXED_FILE on the SQE)
+        io_uring_prep_splice(self.get_sqe(conn.fd, OP_SPLICE_IN, flags),
+                             conn.file_index, conn.offset, conn.pipe_w, -1, n,
+                             SPLICE_F_FD_IN_FIXED)
+        return n
+
+    def queue_splice_out(self, conn, n):
+        io_uring_prep_splice(self.get_sqe(conn.fd, OP_SPLICE_OUT),
+                             conn.pipe_r, -1, conn.fd, -1, n, 0)
+
+    def next_step(self, conn):
+        # Queue the next linked chain for conn once the previous one is done
+        if conn.send_buf:
+            flags = IOSQE_IO_LINK if conn.to_read and not conn.in_pipe else 0
+            # Linked to the body: MSG_WAITALL makes a short send fail the link,
+            # so no body byte can go out ahead of the rest of the headers
+            # (the cancelled splices are queued again with the remainder)
+            io_uring_prep_send(self.get_sqe(conn.fd, OP_SEND, flags), conn.fd, conn.send_buf,
+                               socket.MSG_WAITALL if flags else 0)
+            conn.inflight = 1
+            if flags:
+                n = self.queue_splice_in(conn, IOSQE_IO_LINK)
+                self.queue_splice_out(conn, n)
+                conn.inflight = 3
+        elif conn.in_pipe:
+            self.queue_splice_out(conn, conn.in_pipe)
+            conn.inflight = 1
+        elif conn.to_read:
+            n = self.queue_splice_in(conn, IOSQE_IO_LINK)
+            self.queue_splice_out(conn, n)
+            conn.inflight = 2
+        elif not conn.keep_alive:
+            self.drop(conn)
+        elif b"\r\n\r\n" in conn.data:
+            # Pipelined request already buffered
+            self.start_response(conn)
+        else:
+            self.arm_recv(conn)
+
+    def start_response(self, conn):
+        head, _, conn.data = conn.data.partition(b"\r\n\r\n")
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, target, version = lines[0].split(" ", 2)
+        except ValueError:
+            self.drop(conn)
+            return
+        headers = {}
+        for line in lines[1:]:
+            name, sep, value = line.partition(":")
+            if sep:
+                headers[name.strip().lower()] = value.strip()
+        conn.keep_alive = (headers.get("connection", "").lower() != "close"
+                           and version == "HTTP/1.1")
+        connection = "keep-alive" if conn.keep_alive else "close"
+
+        entry = self.files.get(os.path.normpath(translate_path(target)))
+        if method not in ("GET", "HEAD") or entry is None:
+            status = "405 Method Not Allowed" if entry is not None else "404 Not Found"
+            conn.send_buf = (f"HTTP/1.1 {status}\r\nContent-Length: 0\r\n"
+                             f"Connection: {connection}\r\n\r\n").encode()
+            self.next_step(conn)
+            return
+
+        index, size = entry
+        rng = None
+        if "range" in headers and "resolve" in target:
+            rng = parse_range(headers["range"], size)
+        if rng:
+            start, end = rng
+            status = "206 Partial Content"
+            extra = f"Content-Range: bytes {start}-{end}/{size}\r\n"
+        else:
+            start, end = 0, size - 1
+            status = "200 OK"
+            extra = ""
+        length = end - start + 1
+        content_type = ("application/json" if target.startswith("/api/")
+                        else "application/octet-stream")
+        conn.send_buf = (f"HTTP/1.1 {status}\r\n"
+                         f"Content-Type: {content_type}\r\n"
+                         f"Content-Length: {length}\r\n"
+                         f"Accept-Ranges: bytes\r\n"
+                         f"{extra}"
+                         f"Connection: {connection}\r\n\r\n").encode()
+        conn.file_index = index
+        conn.offset = start
+        conn.to_read = length if method == "GET" else 0
+        self.next_step(conn)
+
+    def drop(self, conn):
+        del self.conns[conn.fd]
+        conn.close()
+
+    def complete(self, user_data, res, flags):
+        fd, op = user_data >> 3, user_data & 7
+        if op == OP_ACCEPT:
+            if res >= 0:
+                self.conns[res] = conn = Connection(res)
+                self.arm_recv(conn)
+            if not flags & IORING_CQE_F_MORE:
+                self.arm_accept()
+            return
+
+        conn = self.conns.get(fd)
+        if conn is None:
+            return
+        conn.inflight -= 1
+        if res < 0 and res != -errno.ECANCELED:
+            # Peer went away (or a splice failed); anything else linked to
+            # this op completes with -ECANCELED and is ignored
+            print(f"Error on connection {fd} (op {op}): {os.strerror(-res)}")
+            conn.keep_alive = False
+            conn.send_buf = b""
+            conn.to_read = conn.in_pipe = 0
+        elif op == OP_RECV:
+            if res == 0:
+                conn.keep_alive = False
+            else:
+                conn.data += conn.recv_buf[:res]
+                if b"\r\n\r\n" not in conn.data:
+                    self.arm_recv(conn)
+                    return
+        elif res < 0:
+            # Cancelled link member: the accounting below picks it up again
+            pass
+        elif op == OP_SEND:
+            conn.send_buf = conn.send_buf[res:]
+        elif op == OP_SPLICE_IN:
+            if res == 0:
+                conn.keep_alive = False
+                conn.to_read = 0
+            conn.in_pipe += res
+            conn.offset += res
+            conn.to_read -= res
+        elif op == OP_SPLICE_OUT:
+            conn.in_pipe -= res
+
+        if conn.inflight == 0:
+            if op == OP_RECV and conn.keep_alive:
+                self.start_response(conn)
+            else:
+                self.next_step(conn)
+
+    def serve_forever(self):
+        self.arm_accept()
+        try:
+            while True:
+                io_uring_submit_and_wait(self.ring, 1)
+                # Reap every ready CQE before the next submit (CqeIter walks
+                # the CQ ring with wrap-around; cqe[0] is the current entry)
+                n = 0
+                for _ in CqeIter(self.ring, self.cqe):
+                    c = self.cqe[0]
+                    try:
+                        res = c.res
+                    except OSError as e:
+                        # The binding raises for negative results
+                        res = -e.errno
+                    self.complete(c.user_data, res, c.flags)
+                    n += 1
+                io_uring_cq_advance(self.ring, n)
+        finally:
+            io_uring_queue_exit(self.ring)
+            for fd in self.fds:
+                os.close(fd)
+
+def scan_files():
+    # Every file the server can hand out, keyed by translate_path's result
+    root = os.path.join(os.getcwd(), DATA_DIR)
+    files = {}
+    for dirpath, _, names in os.walk(root):
+        for name in names:
+            path = os.path.normpath(os.path.join(dirpath, name))
+            if os.path.isfile(path):
+                files[path] = (len(files), os.path.getsize(path))
+    return files
+
+def run_server():
+    files = scan_files()
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind(("", 0))
+    sock.listen(128)
+    port = sock.getsockname()[1]
+    with open("server.port", "w") as f:
+        f.write(str(port))
+    print(f"Serving Mock HF at port {port} (io_uring, {len(files)} files registered)")
+    UringServer(sock, files).serve_forever()
+
+if __name__ == "__main__":
+    run_server()
@@ -1,6 +1,8 @@
 #!/usr/bin/env python3
 import math
 
+import numpy as np
+
 # =================================================================================
 # System Constants (High-End Workstation / Modern Mac Optimization)
 # =================================================================================
@@ -10,6 +12,9 @@ import math
 RTT_MS = 100.0  # 100ms Round Trip Time (intercontinental)
 TCP_WINDOW_SCALE = 1.0  # Effective Window scaling factor efficiency
 PACKET_LOSS = 0.0001  # 0.01% packet loss
+TCP_WINDOW = 16 * 1024**2  # Auto-tuned receive window ceiling (bytes)
+HANDSHAKE_RTT = 2 * RTT_MS / 1000  # TCP + TLS handshake, seconds per new connection
+KEEP_ALIVE_REUSE = 100  # Range requests served per kept-alive connection
 
 # 1. Hardware Limits
 CPU_CORES = 8  # Performance cores
@@ -24,6 +29,7 @@ NET_BW_GBPS = 10.0  # 10 Gbps Link (Targeting high speed)
 CYCLES_SYSCALL_BASE = 1500  # Cost of entering/exiting kernel (read/write)
 CYCLES_CTX_SWITCH = 3000  # Determining next thread
 CYCLES_K_FRAMEWORK = 500  # Overhead of internal kernel buffer management
+CYCLES_TLS_HANDSHAKE = 50e6  # Key exchange + certificate verification per connection
 
 # 3. Processing Costs (per byte) - Revised
 # TLS overhead includes record layer framing, MAC check, IV generation.
@@ -37,6 +43,10 @@ CYCLES_HTTP_PARSE = 1.0  # Checksum/boundary checks
 # we dominate L2/L3 with new data anyway.
 CACHE_L2_SIZE = 12 * 1024 * 1024
 
+# 5. Search space, shared by every scenario
+_BUFFERS = np.array([64 * 1024 * (1 << i) for i in range(12)], dtype=np.int64)  # 64KB -> 128MB
+_THREADS = np.arange(1, 65, dtype=np.int64)
+
 # =================================================================================
 # Optimization Model
 # =================================================================================
@@ -65,6 +75,13 @@ CACHE_L2_SIZE = 12 * 1024 * 1024
 #
 # 4. Memory Capacity:
 #    N * B <= SAFE_RAM_LIMIT (e.g., 2GB or 10% of RAM)
+#
+# 6. Connection setup (each thread fetches one B-sized Range per request):
+#    A new connection costs HANDSHAKE_RTT of wall time and CYCLES_TLS_HANDSHAKE,
+#    paid once per KEEP_ALIVE_REUSE requests. Per thread:
+#    R_thread = B / (B / (TCP_WINDOW / RTT) + HANDSHAKE_RTT / KEEP_ALIVE_REUSE)
+#    and the handshake adds CYCLES_TLS_HANDSHAKE / KEEP_ALIVE_REUSE per request
+#    to Cost_Per_Chunk.
 
 
 def solve_optimization():
@@ -74,20 +91,20 @@ def solve_optimization():
     # Costs
     cost_per_byte = CYCLES_TLS_PER_BYTE + CYCLES_MEMCPY_PER_BYTE + CYCLES_HTTP_PARSE
     cost_per_chunk = (CYCLES_SYSCALL_BASE + CYCLES_K_FRAMEWORK) * 2 + CYCLES_CTX_SWITCH
+    # Handshake cost amortized over the requests sharing a connection
+    cost_per_request = CYCLES_TLS_HANDSHAKE / KEEP_ALIVE_REUSE
+    setup_time_per_request = HANDSHAKE_RTT / KEEP_ALIVE_REUSE
 
     # Bandwidth Limits (in Bytes/sec)
     limit_net_hw = NET_BW_GBPS * 1e9 / 8.0
     limit_disk = DISK_BW_GBPS * 1e9
     limit_ram_bw = (RAM_BW_GBPS * 1e9) / 4.0  # Effective throughput limit due to copies
 
-    # TCP Throughput Limit (Mathis Equation approximation or BPD limit)
+    # TCP Throughput Limit (BDP limit)
     # Single stream limit ~= WindowSize / RTT
-    # Modern TCP stack auto-tunes window, but realistic single-stream max is often ~1-2 Gbps over WAN due to loss/latency
-    # BDP = Bandwidth * Delay
-    # Max practical single thread speed often capped by receiver window or congestion control dynamics
-    limit_tcp_per_thread = (
-        2.0 * 1024**3
-    ) / 8.0  # Cap single thread at 2Gbps realistic WAN
+    # Modern TCP stack auto-tunes window up to TCP_WINDOW, so one stream over
+    # a 100ms path tops out around 1.3 Gbps
+    limit_tcp_per_thread = TCP_WINDOW_SCALE * TCP_WINDOW / (RTT_MS / 1000)
 
     global_limit_hw = min(limit_net_hw, limit_disk, limit_ram_bw)
 
@@ -98,47 +115,64 @@ def solve_optimization():
     print(f"Cost per Byte: {cost_per_byte} cycles")
     print(f"Cost per Chunk: {cost_per_chunk} cycles (syscalls + overhead)")
     print(f"TCP RTT: {RTT_MS} ms")
+    print(f"TCP Limit per Thread: {limit_tcp_per_thread / 1e6:.1f} MB/s ({TCP_WINDOW / 1024**2:.0f} MB window)")
+    print(f"Connection Setup: {HANDSHAKE_RTT * 1000:.0f} ms per {KEEP_ALIVE_REUSE} requests (keep-alive)")
     print(f"---------------------------\n")
 
+    def throughput(n, b, cpu_limit_percent):
+        # Sustainable R for thread count(s) n and buffer size(s) b; scalars
+        # or broadcastable arrays. Infeasible points score 0.
+        ram_ok = n * b <= MAX_RAM_USAGE
+
+        # Each B-sized request also waits for its share of connection setup
+        per_thread = b / (b / limit_tcp_per_thread + setup_time_per_request)
+        limit_net_effective = np.minimum(limit_net_hw, n * per_thread)
+
+        denom = cost_per_byte + ((cost_per_chunk + cost_per_request) / b)
+        thread_overhead = n * 5000
+        total_cycles_avail = (CPU_CORES * CPU_FREQ * cpu_limit_percent) - thread_overhead
+
+        # Max throughput CPU can sustain at this limit (none without spare cycles)
+        max_r_cpu = np.where(total_cycles_avail > 0, total_cycles_avail / denom, 0.0)
+
+        # Intersection
+        r = np.minimum(np.minimum(limit_disk, limit_ram_bw), np.minimum(limit_net_effective, max_r_cpu))
+        return np.where(ram_ok, r, 0.0)
+
+    def analytic_buffer(n, r):
+        # Closed-form B at thread count n. CPU-bound, R = C / (cost_per_byte +
+        # cost_per_chunk / B) only grows with B, so the largest buffer the RAM
+        # budget allows wins. Bandwidth-bound, B just has to amortize the
+        # per-chunk/per-request cost (cost / B << cost_per_byte) and make the
+        # transfer time of B dwarf the amortized connection setup.
+        bandwidth_limit = min(limit_disk, limit_ram_bw, limit_net_hw, n * limit_tcp_per_thread)
+        largest = min(int(_BUFFERS[-1]), int(MAX_RAM_USAGE // n))
+        if r < 0.99 * bandwidth_limit:
+            return largest
+        amortized = max(100 * (cost_per_chunk + cost_per_request) / cost_per_byte,
+                        100 * limit_tcp_per_thread * setup_time_per_request)
+        return min(largest, max(int(_BUFFERS[0]), math.ceil(amortized)))
+
     def run_scenario(cpu_limit_percent, duration_str):
         print(
             f"=== Scenario: {cpu_limit_percent * 100:.0f}% CPU Limit ({duration_str}) ==="
         )
 
-        best_r = 0
-        best_n = 1
-        best_b = 4096
-
-        # Grid Search
-        buffers = [64 * 1024 * (2**i) for i in range(12)]  # 64KB -> 128MB
-        threads = range(1, 65)
-
-        for n in threads:
-            for b in buffers:
-                if n * b > MAX_RAM_USAGE:
-                    continue
-
-                limit_net_effective = min(limit_net_hw, n * limit_tcp_per_thread)
-
-                denom = cost_per_byte + (cost_per_chunk / b)
-                thread_overhead = n * 5000
-                total_cycles_avail = (
-                    CPU_CORES * CPU_FREQ * cpu_limit_percent
-                ) - thread_overhead
-
-                if total_cycles_avail <= 0:
-                    continue
-
-                # Max throughput CPU can sustain at this limit
-                max_r_cpu = total_cycles_avail / denom
-
-                # Intersection
-                r = min(limit_disk, limit_ram_bw, limit_net_effective, max_r_cpu)
-
-                if r > best_r:
-                    best_r = r
-                    best_n = n
-                    best_b = b
+        # Grid Search, evaluated as one broadcast over threads x buffers
+        n = _THREADS[:, None]
+        b = _BUFFERS[None, :]
+        r = throughput(n, b, cpu_limit_percent)
+
+        # argmax returns the first maximum in (threads, buffers) order, the
+        # same point the original nested loop settled on
+        i, j = np.unravel_index(np.argmax(r), r.shape)
+        best_r = float(r[i, j])
+        if best_r > 0:
+            best_n = int(n[i, 0])
+            best_b = int(b[0, j])
+        else:
+            best_n = 1
+            best_b = 4096
 
         print(f"Threads:       {best_n}")
         print(f"Buffer Size:   {best_b / 1024 / 1024:.2f} MB")
@@ -146,8 +180,16 @@ def solve_optimization():
             f"Throughput:    {best_r / 1024 / 1024:.2f} MB/s ({best_r * 8 / 1e9:.2f} Gbps)"
         )
 
+        # Verify the grid against the analytic buffer size at the same N
+        b_opt = analytic_buffer(best_n, best_r)
+        r_opt = float(throughput(best_n, b_opt, cpu_limit_percent))
+        print(
+            f"Analytic B:    {b_opt / 1024 / 1024:.2f} MB ({r_opt / 1024 / 1024:.2f} MB/s, "
+            f"{'matches' if r_opt >= 0.999 * best_r else 'below'} grid)"
+        )
+
         # CPU Check
-        denom = cost_per_byte + (cost_per_chunk / best_b)
+        denom = cost_per_byte + ((cost_per_chunk + cost_per_request) / best_b)
         thread_overhead = best_n * 5000
         cycles_used = (best_r * denom) + thread_overhead
         actual_cpu = cycles_used / (CPU_CORES * CPU_FREQ)
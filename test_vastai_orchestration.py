@@ -4,12 +4,34 @@ Basic validation tests for Vast.ai Flux orchestration scripts
 Tests basic functionality without requiring a real Vast.ai instance
 """
 
+import importlib
 import json
 import os
 import sys
 import tempfile
 from pathlib import Path
 
+# Scripts under test are imported once, up front; the tests below reuse the
+# loaded modules and test_script_imports reports any failure recorded here
+SCRIPTS = [
+    "vastai_flux_orchestrator",
+    "flux_generator",
+    "resource_monitor"
+]
+IMPORT_ERRORS = {}
+for _script_name in SCRIPTS:
+    try:
+        importlib.import_module(_script_name)
+    except Exception as e:
+        IMPORT_ERRORS[_script_name] = e
+
+
+def orchestrator_class():
+    """VastAIOrchestrator from the already imported orchestrator module"""
+    if "vastai_flux_orchestrator" in IMPORT_ERRORS:
+        raise IMPORT_ERRORS["vastai_flux_orchestrator"]
+    return sys.modules["vastai_flux_orchestrator"].VastAIOrchestrator
+
 # Test configuration loading
 def test_config_loading():
     """Test that configuration files can be loaded"""
@@ -66,19 +88,12 @@ def test_script_imports():
     """Test that all scripts can be imported without errors"""
     print("Testing script imports...")
     
-    scripts = [
-        "vastai_flux_orchestrator",
-        "flux_generator",
-        "resource_monitor"
-    ]
-    
     all_ok = True
-    for script_name in scripts:
-        try:
-            __import__(script_name)
+    for script_name in SCRIPTS:
+        if script_name in sys.modules and script_name not in IMPORT_ERRORS:
             print(f"  ✓ {script_name}.py imports successfully")
-        except Exception as e:
-            print(f"  ✗ {script_name}.py import failed: {e}")
+        else:
+            print(f"  ✗ {script_name}.py import failed: {IMPORT_ERRORS.get(script_name)}")
             all_ok = False
     
     return all_ok
@@ -89,7 +104,7 @@ def test_orchestrator_init():
     print("Testing orchestrator initialization...")
     
     try:
-        from vastai_flux_orchestrator import VastAIOrchestrator
+        VastAIOrchestrator = orchestrator_class()
         
         # Test with default config
         orch = VastAIOrchestrator("ssh -p 12345 root@example.com")
@@ -110,7 +125,7 @@ def test_ssh_parsing():
     print("Testing SSH command parsing...")
     
     try:
-        from vastai_flux_orchestrator import VastAIOrchestrator
+        VastAIOrchestrator = orchestrator_class()
         
         # Test various SSH command formats
         test_cases = [
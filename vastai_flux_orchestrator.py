@@ -12,15 +12,32 @@ on a Vast.ai GPU instance, including:
 """
 
 import argparse
+import collections
+import hashlib
+import queue
+import re
+import shlex
+import shutil
 import subprocess
 import sys
+import tarfile
+import tempfile
+import threading
 import time
-import json
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 import os
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import Iterator, List, Dict, Optional, Tuple
 import logging
 
+# orjson parses several times faster when a controller loads configs for
+# many instances; the stdlib parser accepts the same bytes otherwise
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -28,6 +45,92 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Printed by batched setup scripts before each stage, so a single ssh session
+# can still report which stage ran (and which one failed)
+STAGE_MARKER = "==> stage: "
+
+# AES-GCM first: AES-NI makes it faster per core than the chacha20 default
+# on most hosts. Listed explicitly (not "^...") so older OpenSSH accepts it.
+SSH_CIPHERS = ("aes128-gcm@openssh.com,aes256-gcm@openssh.com,"
+               "chacha20-poly1305@openssh.com,aes128-ctr,aes256-ctr")
+
+# sshd's default MaxSessions is 10 per connection; leave room for the
+# setup script and log stream sharing the same multiplexed connection
+MAX_UPLOAD_PARALLELISM = 8
+
+# Container the generator and monitor run in when docker_image is configured
+CONTAINER_NAME = "flux"
+
+# Seconds between generator status updates while monitoring
+STATUS_INTERVAL = 30
+
+# Generator log lines that mark the run as failed: ERROR/CRITICAL records,
+# uncaught tracebacks, and a non-zero failure count in the final summary
+# (warnings from the libraries, or "Failed: 0", do not count)
+ERROR_PATTERN = re.compile(r" - (?:ERROR|CRITICAL) - |^Traceback |Failed: [1-9]")
+
+
+def normalize_package_name(requirement: str) -> str:
+    """PEP 503 name of a requirement or pip freeze line ('Foo_Bar>=1' -> 'foo-bar')"""
+    name = re.match(r"[A-Za-z0-9._-]*", requirement.strip()).group(0)
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+
+def extract_ssh_target(ssh_parts: List[str]) -> Tuple[Optional[str], Optional[str]]:
+    """(port, user@host) from a split SSH command; either may be None"""
+    port = None
+    host = None
+    
+    # Parse SSH command options
+    i = 0
+    while i < len(ssh_parts):
+        part = ssh_parts[i]
+        
+        # Handle -p or -P with space
+        if part in ['-p', '-P'] and i + 1 < len(ssh_parts):
+            port = ssh_parts[i + 1]
+            i += 2
+        # Handle -p12345 or -P12345 (no space)
+        elif part.startswith('-p') and len(part) > 2:
+            port = part[2:]
+            i += 1
+        elif part.startswith('-P') and len(part) > 2:
+            port = part[2:]
+            i += 1
+        # Find host (contains @)
+        elif '@' in part:
+            host = part
+            i += 1
+        else:
+            i += 1
+    
+    return port, host
+
+
+def extract_ssh_identity(ssh_parts: List[str]) -> Optional[str]:
+    """Key file given with -i (last one wins, as for ssh), or None"""
+    identity = None
+    for i, part in enumerate(ssh_parts):
+        if part == '-i' and i + 1 < len(ssh_parts):
+            identity = ssh_parts[i + 1]
+        elif part.startswith('-i') and len(part) > 2:
+            identity = part[2:]
+    return identity
+
+
+def only_port_and_identity(ssh_opts: List[str]) -> bool:
+    """True if ssh_opts holds nothing but -p/-P and -i options"""
+    i = 0
+    while i < len(ssh_opts):
+        part = ssh_opts[i]
+        if part in ['-p', '-P', '-i'] and i + 1 < len(ssh_opts):
+            i += 2
+        elif part[:2] in ['-p', '-P', '-i'] and len(part) > 2:
+            i += 1
+        else:
+            return False
+    return True
+
 
 class VastAIOrchestrator:
     """Orchestrates Flux1 Schnell generation on Vast.ai instances"""
@@ -41,9 +144,45 @@ class VastAIOrchestrator:
             config_path: Path to configuration file
         """
         self.ssh_command = ssh_command
+        # Parsed once; every ssh/scp invocation below is built as argv from these
+        self.ssh_parts = shlex.split(ssh_command)
+        self.port, self.host = extract_ssh_target(self.ssh_parts)
+        self.identity = extract_ssh_identity(self.ssh_parts)
+        # Everything but the program and the destination, for tools (rsync -e)
+        # that take the ssh command and the host separately
+        self.ssh_opts = [part for part in self.ssh_parts[1:] if part != self.host]
         self.config = self._load_config(config_path)
         self.instance_id = None
         
+        # Fixed for the life of the orchestrator: resolved (and, for the
+        # launch commands, rendered) once here instead of on every call
+        self.workspace = self.config["remote_workspace"]
+        self.output_dir = f"{self.workspace}/{self.config['output_dir']}"
+        self.has_git = bool(self.config.get("git_repo_url"))
+        # Prefix for commands that run in the workspace, quoted once
+        self._cd = f"cd {shlex.quote(self.workspace)} && "
+        self._gen_cmd = self.generator_command()
+        self._mon_cmd = self.monitor_command()
+        
+        # Every ssh/scp call is multiplexed over one ControlMaster connection,
+        # so only the first pays for TCP setup, key exchange and auth
+        # (socket in the temp dir: short enough for the ~104 byte sun_path
+        # limit wherever $HOME is, and nothing to create under ~/.ssh)
+        digest = hashlib.sha1(ssh_command.encode()).hexdigest()[:8]
+        self.control_path = os.path.join(tempfile.gettempdir(), f"vastai-cm-{os.getpid()}-{digest}.sock")
+        self._ctl_args = ['-o', f'ControlPath={self.control_path}']
+        # Only take effect on connections that are actually opened (the
+        # master, or direct fallbacks); multiplexed calls inherit the master's
+        self._cipher_args = ['-o', f'Ciphers={SSH_CIPHERS}']
+        self._master_started = False
+        
+        # Persistent paramiko session, when paramiko is installed; opened on
+        # first use like the ControlMaster above
+        self.client = None
+        self._client_tried = False
+        # Setup steps run in parallel; only one of them may open the session
+        self._connect_lock = threading.Lock()
+        
     def _load_config(self, config_path: Optional[str]) -> Dict:
         """Load configuration from file or use defaults"""
         default_config = {
@@ -54,6 +193,8 @@ class VastAIOrchestrator:
             "prompts_file": "prompts.txt",
             "output_dir": "generated_images",
             "resource_monitor_interval": 60,
+            "upload_parallelism": 4,
+            "docker_image": None,
             "auto_shutdown": True,
             "requirements": [
                 "torch",
@@ -64,14 +205,14 @@ class VastAIOrchestrator:
                 "safetensors",
                 "pillow",
                 "psutil",
-                "gitpython"
+                "gitpython",
+                "nvidia-ml-py"
             ]
         }
         
         if config_path and os.path.exists(config_path):
-            with open(config_path, 'r') as f:
-                user_config = json.load(f)
-                default_config.update(user_config)
+            user_config = json_loads(Path(config_path).read_bytes())
+            default_config.update(user_config)
         
         return default_config
     
@@ -91,85 +232,310 @@ class VastAIOrchestrator:
                 return True
             else:
                 logger.error("SSH connection failed")
-                logger.error(f"stderr: {result.stderr}")
+                logger.error("stderr: %s", result.stderr)
                 return False
                 
         except Exception as e:
-            logger.error(f"Connection test failed: {e}")
+            logger.error("Connection test failed: %s", e)
             return False
     
-    def run_remote_command(self, command: str, check: bool = True) -> subprocess.CompletedProcess:
+    def _ssh_args(self, *options: str) -> List[str]:
+        """ssh argv with options inserted before the destination"""
+        return [self.ssh_parts[0], *options, *self._ctl_args, *self._cipher_args, *self.ssh_parts[1:]]
+    
+    def _ensure_master(self):
+        """Start the shared ControlMaster connection on first use"""
+        with self._connect_lock:
+            if self._master_started:
+                return
+            self._master_started = True
+            
+            # -f backgrounds the master once authenticated; its stdio must not be
+            # our pipes or every later capture would wait for it to exit.
+            # Compressed: everything sent over it is commands, scripts,
+            # prompts and logs.
+            result = subprocess.run(
+                self._ssh_args('-M', '-N', '-f', '-C', '-o', 'ControlPersist=600'),
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                check=False
+            )
+            if result.returncode != 0:
+                # Later calls find no socket and connect directly
+                logger.warning("Could not start SSH ControlMaster, connections will not be shared")
+    
+    def _client(self):
+        """
+        Authenticated paramiko client, connected on first use
+            
+        paramiko only covers host, port and key, so it is used only when that
+        is all the ssh command and ~/.ssh/config specify; anything else
+        (-o options, ProxyJump, forwards, per-host settings) stays with the
+        ssh binary.
+        
+        Returns:
+            SSHClient, or None to use the ssh binary (paramiko missing, the
+            command needs the ssh binary, or the connection failed)
+        """
+        with self._connect_lock:
+            if self._client_tried:
+                return self.client
+            self._client_tried = True
+            
+            try:
+                import paramiko
+            except ImportError:
+                return None
+            
+            if not self.host or not only_port_and_identity(self.ssh_opts):
+                return None
+            user, _, hostname = self.host.rpartition('@')
+            
+            ssh_config = Path.home() / ".ssh" / "config"
+            if ssh_config.exists():
+                # lookup() always returns the hostname; any other key is a
+                # setting paramiko would silently ignore
+                settings = paramiko.SSHConfig.from_path(str(ssh_config)).lookup(hostname)
+                if set(settings) - {"hostname"}:
+                    return None
+            
+            client = paramiko.SSHClient()
+            client.load_system_host_keys()
+            # Host keys are checked like ssh does: a changed key fails, and an
+            # unknown host is left to the ssh binary, which asks (or applies
+            # StrictHostKeyChecking) and records it for the next run
+            client.set_missing_host_key_policy(paramiko.RejectPolicy())
+            # Same key the ssh binary would be given; agent and default
+            # keys are still tried after it
+            key_filename = os.path.expanduser(self.identity) if self.identity else None
+            try:
+                client.connect(hostname, port=int(self.port or 22), username=user or None,
+                               key_filename=key_filename, compress=True)
+            except Exception as e:
+                logger.warning("paramiko connection failed (%s), falling back to ssh", e)
+                client.close()
+                return None
+            
+            self.client = client
+            return client
+    
+    def close(self):
+        """Shut down the shared SSH session (paramiko and ControlMaster)"""
+        if self.client is not None:
+            self.client.close()
+            self.client = None
+        self._client_tried = False
+        
+        if not self._master_started:
+            return
+        self._master_started = False
+        subprocess.run(
+            self._ssh_args('-O', 'exit'),
+            stdin=subprocess.DEVNULL,
+            capture_output=True,
+            check=False
+        )
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+    
+    def _run(self, command: str, input: Optional[str] = None,
+             capture: bool = True) -> subprocess.CompletedProcess:
+        """Run command remotely, feeding it input, and capture its output unless told not to"""
+        client = self._client()
+        if client is not None:
+            # A new channel on the existing transport: no process, no re-auth
+            stdin, stdout, stderr = client.exec_command(command)
+            if input is not None:
+                stdin.write(input)
+            stdin.channel.shutdown_write()
+            
+            # Both streams are drained at once, and also when not captured:
+            # paramiko only reopens the channel window as buffered data is
+            # read, so a remote filling either one would stall otherwise
+            def drain(stream):
+                chunks = []
+                while True:
+                    chunk = stream.read(32768)
+                    if not chunk:
+                        return b"".join(chunks).decode(errors="replace") if capture else None
+                    if capture:
+                        chunks.append(chunk)
+            
+            err_reader = ThreadPoolExecutor(max_workers=1)
+            err_future = err_reader.submit(drain, stderr)
+            out = drain(stdout)
+            err = err_future.result()
+            err_reader.shutdown()
+            returncode = stdout.channel.recv_exit_status()
+            return subprocess.CompletedProcess(command, returncode, out, err)
+        
+        self._ensure_master()
+        # ssh hands the command to the remote shell as-is; no local shell.
+        # Uncaptured output goes to /dev/null: no pipes, no reader threads.
+        output = subprocess.PIPE if capture else subprocess.DEVNULL
+        return subprocess.run(
+            [*self._ssh_args(), command],
+            input=input,
+            stdin=subprocess.DEVNULL if input is None else None,
+            stdout=output,
+            stderr=output,
+            text=True,
+            check=False
+        )
+    
+    @contextmanager
+    def _remote_stdin(self, command: str):
+        """Binary stream into command's stdin on the remote; raises if command fails"""
+        client = self._client()
+        if client is not None:
+            stdin, stdout, _ = client.exec_command(command)
+            try:
+                yield stdin
+            finally:
+                stdin.channel.shutdown_write()
+                returncode = stdout.channel.recv_exit_status()
+        else:
+            self._ensure_master()
+            proc = subprocess.Popen([*self._ssh_args(), command], stdin=subprocess.PIPE)
+            try:
+                yield proc.stdin
+            finally:
+                proc.stdin.close()
+                returncode = proc.wait()
+        
+        if returncode != 0:
+            raise RuntimeError(f"Remote command failed: {command} (exit code {returncode})")
+    
+    def _stream(self, command: str) -> Iterator[str]:
+        """Lines of command's remote stdout as they arrive, until it exits"""
+        client = self._client()
+        if client is not None:
+            stdin, stdout, _ = client.exec_command(command)
+            stdin.channel.shutdown_write()
+            for line in stdout:
+                yield line.rstrip("\n")
+            stdout.channel.recv_exit_status()
+            return
+        
+        self._ensure_master()
+        with subprocess.Popen(
+            [*self._ssh_args(), command],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            text=True
+        ) as proc:
+            for line in proc.stdout:
+                yield line.rstrip("\n")
+    
+    def run_remote_command(self, command: str, check: bool = True,
+                           capture: bool = True) -> subprocess.CompletedProcess:
         """
         Execute a command on the remote Vast.ai instance
         
         Args:
             command: Command to execute
             check: Whether to check return code
+            capture: Whether to capture stdout/stderr; turn off for commands
+                whose output is never looked at
             
         Returns:
-            CompletedProcess object
+            CompletedProcess object (stdout/stderr are None without capture)
         """
-        full_command = f"{self.ssh_command} '{command}'"
-        logger.info(f"Executing remote: {command}")
-        
-        result = subprocess.run(
-            full_command,
-            shell=True,
-            capture_output=True,
-            text=True,
-            check=False
-        )
+        logger.info("Executing remote: %s", command)
+        result = self._run(command, capture=capture)
         
         if check and result.returncode != 0:
-            logger.error(f"Command failed: {command}")
-            logger.error(f"stdout: {result.stdout}")
-            logger.error(f"stderr: {result.stderr}")
+            logger.error("Command failed: %s", command)
+            if capture:
+                logger.error("stdout: %s", result.stdout)
+                logger.error("stderr: %s", result.stderr)
             raise RuntimeError(f"Remote command failed: {command}")
         
         return result
     
-    def copy_to_remote(self, local_path: str, remote_path: str):
-        """Copy file to remote instance"""
-        import shlex
-        
-        # Extract SSH details from ssh_command using proper shell parsing
-        ssh_parts = shlex.split(self.ssh_command)
-        port = None
-        host = None
+    def _exec_script(self, script: str, check: bool = True) -> subprocess.CompletedProcess:
+        """
+        Run a multi-line shell script on the remote instance over one ssh session
         
-        # Parse SSH command options
-        i = 0
-        while i < len(ssh_parts):
-            part = ssh_parts[i]
+        Args:
+            script: Script fed to a remote 'bash -s'; stops at the first failing command
+            check: Whether to check return code
             
-            # Handle -p or -P with space
-            if part in ['-p', '-P'] and i + 1 < len(ssh_parts):
-                port = ssh_parts[i + 1]
-                i += 2
-            # Handle -p12345 or -P12345 (no space)
-            elif part.startswith('-p') and len(part) > 2:
-                port = part[2:]
-                i += 1
-            elif part.startswith('-P') and len(part) > 2:
-                port = part[2:]
-                i += 1
-            # Find host (contains @)
-            elif '@' in part:
-                host = part
-                i += 1
-            else:
-                i += 1
+        Returns:
+            CompletedProcess object
+        """
+        result = self._run("bash -s", input="set -e\n" + script)
         
-        # Build scp command
-        if port and host:
-            scp_command = f"scp -P {port} {shlex.quote(local_path)} {host}:{shlex.quote(remote_path)}"
-        elif host:
-            scp_command = f"scp {shlex.quote(local_path)} {host}:{shlex.quote(remote_path)}"
-        else:
+        stage = None
+        for line in result.stdout.splitlines():
+            if line.startswith(STAGE_MARKER):
+                stage = line[len(STAGE_MARKER):]
+                logger.info("Remote stage: %s", stage)
+        
+        if check and result.returncode != 0:
+            logger.error("Remote script failed in stage: %s", stage)
+            logger.error("stdout: %s", result.stdout)
+            logger.error("stderr: %s", result.stderr)
+            raise RuntimeError(f"Remote script failed in stage: {stage}")
+        
+        return result
+    
+    @staticmethod
+    def _stage(name: str, commands: List[str]) -> str:
+        """Script fragment that announces stage name, then runs commands"""
+        return "\n".join([f"echo {shlex.quote(STAGE_MARKER + name)}", *commands])
+    
+    def copy_to_remote(self, local_path: str, remote_path: str, compress: bool = True):
+        """
+        Copy file to remote instance
+        
+        Args:
+            local_path: File to copy
+            remote_path: Destination path on the instance
+            compress: Compress in transit; turn off for already-compressed
+                payloads such as PNGs (only affects a connection scp opens
+                itself, not one multiplexed over the master)
+        """
+        client = self._client()
+        if client is not None:
+            logger.info("Copying %s to %s", local_path, remote_path)
+            with client.open_sftp() as sftp:
+                sftp.put(local_path, remote_path)
+            return
+        
+        if not self.host:
             raise ValueError("Could not extract host from SSH command")
+        self._ensure_master()
+        
+        # Build scp argv (scp passes -o on to ssh, reusing the master); the
+        # remote path is still parsed by the remote shell, so it stays quoted
+        scp_command = ["scp", *self._ctl_args, *self._cipher_args]
+        if compress:
+            scp_command.append("-C")
+        if self.port:
+            scp_command += ["-P", self.port]
+        if self.identity:
+            scp_command += ["-i", self.identity]
+        scp_command += [local_path, f"{self.host}:{shlex.quote(remote_path)}"]
+        
+        logger.info("Copying %s to %s", local_path, remote_path)
+        subprocess.run(scp_command, check=True)
+    
+    def copy_files_to_remote(self, pairs: List[Tuple[str, str]]):
+        """
+        Copy several files at once, each on its own channel of the shared session
         
-        logger.info(f"Copying {local_path} to {remote_path}")
-        subprocess.run(scp_command, shell=True, check=True)
+        Args:
+            pairs: (local path, remote path) pairs
+        """
+        workers = max(1, min(self.config.get("upload_parallelism", 4), MAX_UPLOAD_PARALLELISM, len(pairs)))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(lambda pair: self.copy_to_remote(*pair), pairs))
     
     def check_disk_space(self, min_gb: float = 50.0) -> bool:
         """
@@ -186,7 +552,7 @@ class VastAIOrchestrator:
             result = self.run_remote_command("df -BG / | tail -n 1", check=False)
             
             if result.returncode == 0:
-                logger.info(f"Disk usage: {result.stdout.strip()}")
+                logger.info("Disk usage: %s", result.stdout.strip())
                 
                 # Parse available space from df output (in GB)
                 parts = result.stdout.split()
@@ -194,161 +560,255 @@ class VastAIOrchestrator:
                     avail_str = parts[3].rstrip('G')  # Remove 'G' suffix
                     try:
                         avail_gb = float(avail_str)
-                        logger.info(f"Available disk space: {avail_gb:.1f} GB")
+                        logger.info("Available disk space: %.1f GB", avail_gb)
                         
                         if avail_gb >= min_gb:
-                            logger.info(f"Sufficient disk space available ({avail_gb:.1f} GB >= {min_gb} GB)")
+                            logger.info("Sufficient disk space available (%.1f GB >= %s GB)", avail_gb, min_gb)
                             return True
                         else:
-                            logger.warning(f"Low disk space: {avail_gb:.1f} GB < {min_gb} GB required")
+                            logger.warning("Low disk space: %.1f GB < %s GB required", avail_gb, min_gb)
                             return False
                     except ValueError:
-                        logger.warning(f"Could not parse disk space value: {avail_str}")
+                        logger.warning("Could not parse disk space value: %s", avail_str)
             
             return True  # Assume OK if we can't check
             
         except Exception as e:
-            logger.warning(f"Could not check disk space: {e}")
+            logger.warning("Could not check disk space: %s", e)
             return True  # Assume OK if we can't check
     
-    def install_packages(self):
-        """Install required packages on the remote instance"""
-        logger.info("Installing required packages...")
-        
-        # Update pip
-        self.run_remote_command("pip install --upgrade pip")
-        
-        # Install packages
-        requirements = " ".join(self.config["requirements"])
-        self.run_remote_command(f"pip install {requirements}")
-        
-        logger.info("Package installation complete")
+    def in_environment(self, command: str) -> str:
+        """command, run inside the dependency container when docker_image is set"""
+        if not self.config.get("docker_image"):
+            return command
+        return f"docker exec {CONTAINER_NAME} bash -c {shlex.quote(command)}"
     
-    def setup_workspace(self):
-        """Setup remote workspace directory structure"""
-        logger.info("Setting up workspace...")
-        
-        workspace = self.config["remote_workspace"]
-        output_dir = f"{workspace}/{self.config['output_dir']}"
+    def install_packages(self) -> str:
+        """
+        Script that installs the required packages missing on the remote instance
         
-        self.run_remote_command(f"mkdir -p {workspace}")
-        self.run_remote_command(f"mkdir -p {output_dir}")
+        With docker_image configured, pip is skipped entirely: the image
+        already has every dependency, and starting it is one layered pull.
+        The image must also provide git when git_repo_url is set: the output
+        repository is set up, committed and pushed from inside the container.
         
-        logger.info("Workspace setup complete")
+        Returns:
+            Shell script, or an empty string when everything is already installed
+        """
+        image = self.config.get("docker_image")
+        if image:
+            workspace = shlex.quote(self.workspace)
+            image = shlex.quote(image)
+            # Only the workspace is shared by default; pushing from the
+            # container also needs the host's SSH keys (read-only)
+            mounts = f"-v {workspace}:{workspace}"
+            if self.has_git:
+                mounts += ' -v "$HOME/.ssh:/root/.ssh:ro"'
+            return self._stage("start container", [
+                f"docker pull {image}",
+                f"docker rm -f {CONTAINER_NAME} >/dev/null 2>&1 || true",
+                f"docker run --gpus all -d --name {CONTAINER_NAME} {mounts} {image} sleep infinity"
+            ])
+        
+        # Reused instances (or images with torch preinstalled) already have
+        # most of the list; only hand pip what is missing
+        result = self.run_remote_command("pip freeze", check=False)
+        installed = set()
+        if result.returncode == 0:
+            installed = {normalize_package_name(line) for line in result.stdout.splitlines()}
+        missing = [r for r in self.config["requirements"]
+                   if normalize_package_name(r) not in installed]
+        
+        if not missing:
+            logger.info("All required packages already installed")
+            return ""
+        logger.info("Installing missing packages: %s", ', '.join(missing))
+        
+        workspace = self.workspace
+        requirements = " ".join(shlex.quote(r) for r in missing)
+        
+        return self._stage("install packages", [
+            # Wheel cache on the workspace volume survives reinstalls
+            f"export PIP_CACHE_DIR={shlex.quote(workspace + '/.pip-cache')} PIP_NO_INPUT=1 PIP_PREFER_BINARY=1",
+            # One resolver pass for pip itself and the packages; --upgrade only
+            # ever touches pip and what is missing, never their dependencies
+            f"pip install --upgrade --upgrade-strategy only-if-needed pip {requirements}"
+        ])
     
-    def setup_git_repo(self):
-        """Setup git repository for output commits"""
-        if not self.config.get("git_repo_url"):
-            logger.warning("No git repository URL configured, skipping git setup")
-            return
-        
-        logger.info("Setting up git repository...")
+    def setup_git_repo(self) -> str:
+        """
+        Commands that set up the git repository for output commits
         
-        workspace = self.config["remote_workspace"]
-        output_dir = f"{workspace}/{self.config['output_dir']}"
+        Returns:
+            One '&&'-chained command run from the output directory, or an
+            empty string without a configured repository
+        """
+        if not self.has_git:
+            logger.warning("No git repository URL configured, skipping git setup")
+            return ""
         
         # Initialize git repo if not exists
-        self.run_remote_command(f"cd {output_dir} && (git init || true)")
+        commands = ["{ [ -d .git ] || git init; }"]
         
         # Set git config if provided
         if self.config.get("git_user_name"):
-            self.run_remote_command(
-                f"cd {output_dir} && git config user.name '{self.config['git_user_name']}'"
-            )
+            commands.append(f"git config user.name {shlex.quote(self.config['git_user_name'])}")
         if self.config.get("git_user_email"):
-            self.run_remote_command(
-                f"cd {output_dir} && git config user.email '{self.config['git_user_email']}'"
-            )
+            commands.append(f"git config user.email {shlex.quote(self.config['git_user_email'])}")
         
-        # Add remote if provided
-        repo_url = self.config.get("git_repo_url")
-        if repo_url:
-            self.run_remote_command(
-                f"cd {output_dir} && (git remote add origin {repo_url} || git remote set-url origin {repo_url})"
-            )
+        # Add remote
+        repo_url = shlex.quote(self.config["git_repo_url"])
+        commands.append(f"{{ git remote add origin {repo_url} || git remote set-url origin {repo_url}; }}")
         
-        logger.info("Git repository setup complete")
+        return " && ".join(commands)
     
-    def upload_scripts(self):
-        """Upload generator and monitor scripts to remote instance"""
-        logger.info("Uploading scripts to remote instance...")
+    def _bulk_upload(self, files: List[Tuple[Path, str]]):
+        """
+        Upload files into the remote workspace as one tar stream over one ssh
+        
+        Args:
+            files: (local path, name in the remote workspace) pairs
+        """
+        workspace = self.workspace
+        
+        # The upload is the first thing to touch the workspace, so it creates it
+        with self._remote_stdin(f"mkdir -p {shlex.quote(workspace)} && "
+                                f"tar --no-same-owner -xf - -C {shlex.quote(workspace)}") as stream:
+            # Uncompressed: gzip costs more CPU than it saves on a few small
+            # text files
+            with tarfile.open(fileobj=stream, mode="w|") as tar:
+                for local_path, remote_name in files:
+                    tar.add(str(local_path), arcname=remote_name)
+    
+    def _rsync_upload(self, files: List[Tuple[Path, str]]) -> bool:
+        """
+        Upload files into the remote workspace with one rsync run
+        
+        Unchanged files (same size and mtime) are skipped and changed ones
+        are sent as deltas, so re-running the orchestrator is nearly free.
         
-        workspace = self.config["remote_workspace"]
+        Args:
+            files: (local path, name in the remote workspace) pairs
+            
+        Returns:
+            False if rsync is missing locally or on the instance
+        """
+        if shutil.which("rsync") is None:
+            return False
+        if self.run_remote_command("command -v rsync", check=False, capture=False).returncode != 0:
+            return False
+        self._ensure_master()
+        
+        workspace = self.workspace
+        # rsync's -e takes ssh without the destination
+        ssh = shlex.join([self.ssh_parts[0], *self._ctl_args, *self._cipher_args, *self.ssh_opts])
+        
+        with tempfile.TemporaryDirectory() as staging:
+            # rsync cannot rename within a batch: stage links under the remote
+            # names and let -L send what they point to
+            for local_path, remote_name in files:
+                os.symlink(os.path.abspath(local_path), os.path.join(staging, remote_name))
+            subprocess.run(
+                ["rsync", "-azL", "-e", ssh, "--files-from=-",
+                 f"--rsync-path=mkdir -p {shlex.quote(workspace)} && rsync",
+                 staging + "/", f"{self.host}:{workspace}/"],
+                input="\n".join(remote_name for _, remote_name in files),
+                text=True,
+                check=True
+            )
+        return True
+    
+    def upload_files(self, prompts_file: str):
+        """Upload generator and monitor scripts and the prompts file in one transfer"""
+        logger.info("Uploading scripts and prompts from %s...", prompts_file)
         
-        # Create generator script path
         generator_script = Path(__file__).parent / "flux_generator.py"
         monitor_script = Path(__file__).parent / "resource_monitor.py"
+        wait_script = Path(__file__).parent / "wait_pid.py"
         
+        files = [(Path(prompts_file), "prompts.txt"), (wait_script, "wait_pid.py")]
         if generator_script.exists():
-            self.copy_to_remote(str(generator_script), f"{workspace}/flux_generator.py")
-        
+            files.append((generator_script, "flux_generator.py"))
         if monitor_script.exists():
-            self.copy_to_remote(str(monitor_script), f"{workspace}/resource_monitor.py")
+            files.append((monitor_script, "resource_monitor.py"))
         
-        logger.info("Scripts uploaded")
-    
-    def upload_prompts(self, prompts_file: str):
-        """Upload prompts file to remote instance"""
-        logger.info(f"Uploading prompts from {prompts_file}...")
-        
-        workspace = self.config["remote_workspace"]
-        self.copy_to_remote(prompts_file, f"{workspace}/prompts.txt")
-        
-        logger.info("Prompts uploaded")
+        try:
+            if not self._rsync_upload(files):
+                self._bulk_upload(files)
+        except (RuntimeError, subprocess.CalledProcessError) as e:
+            # e.g. no tar on a minimal image: copy file by file instead
+            logger.warning("Bulk upload failed (%s), copying files individually", e)
+            workspace = self.workspace
+            self.copy_files_to_remote([(str(local_path), f"{workspace}/{remote_name}")
+                                       for local_path, remote_name in files])
+        
+        logger.info("Scripts and prompts uploaded")
     
-    def start_generation(self, prompts_file: str):
-        """Start the generation process on remote instance"""
-        logger.info("Starting generation process...")
-        
-        workspace = self.config["remote_workspace"]
+    def generator_command(self) -> str:
+        """Command line that runs the generator in the remote workspace"""
         num_processes = self.config["num_processes"]
         output_dir = self.config["output_dir"]
         
-        # Build the command to run generator
-        generator_cmd = (
-            f"cd {workspace} && "
-            f"python3 flux_generator.py "
-            f"--prompts prompts.txt "
-            f"--output-dir {output_dir} "
-            f"--num-processes {num_processes} "
-            f"--git-auto-commit"
-        )
-        
-        if self.config.get("git_repo_url"):
-            generator_cmd += " --git-push"
-        
-        # Run in background with nohup
-        self.run_remote_command(
-            f"nohup {generator_cmd} > {workspace}/generator.log 2>&1 &"
-        )
-        
-        logger.info("Generation process started")
+        # Fan-out stays inside flux_generator.py rather than a shell-level
+        # `xargs -P` over prompts: each worker loads the pipeline once and
+        # then pulls batches until the prompts run out, where one process
+        # per prompt would reload the model (and re-init CUDA) per image
+        generator_cmd = [
+            "python3", "flux_generator.py",
+            "--prompts", "prompts.txt",
+            "--output-dir", output_dir,
+            "--num-processes", str(num_processes),
+            "--git-auto-commit"
+        ]
+        
+        if self.has_git:
+            generator_cmd.append("--git-push")
+        
+        return shlex.join(generator_cmd)
     
-    def start_resource_monitor(self):
-        """Start the resource monitoring process"""
-        logger.info("Starting resource monitor...")
-        
-        workspace = self.config["remote_workspace"]
+    def monitor_command(self) -> str:
+        """Command line that runs the resource monitor in the remote workspace"""
         interval = self.config["resource_monitor_interval"]
         output_dir = self.config["output_dir"]
         
-        monitor_cmd = (
-            f"cd {workspace} && "
-            f"python3 resource_monitor.py "
-            f"--output-dir {output_dir} "
-            f"--interval {interval} "
-            f"--git-auto-commit"
-        )
+        monitor_cmd = [
+            "python3", "resource_monitor.py",
+            "--output-dir", output_dir,
+            "--interval", str(interval),
+            "--git-auto-commit"
+        ]
         
-        if self.config.get("git_repo_url"):
-            monitor_cmd += " --git-push"
+        if self.has_git:
+            monitor_cmd.append("--git-push")
         
-        # Run in background with nohup
-        self.run_remote_command(
-            f"nohup {monitor_cmd} > {workspace}/monitor.log 2>&1 &"
-        )
+        return shlex.join(monitor_cmd)
+    
+    def start_all(self):
+        """
+        Start the resource monitor and the generation process in one remote call
         
-        logger.info("Resource monitor started")
+        The same call creates the output directory and sets up the git
+        repository first, so neither needs a round trip of its own.
+        """
+        logger.info("Starting resource monitor and generation process...")
+        
+        output_dir = shlex.quote(self.output_dir)
+        setup = f"mkdir -p {output_dir} && "
+        git_setup = self.setup_git_repo()
+        if git_setup:
+            setup += f"(cd {output_dir} && {git_setup}) && "
+        
+        # Both run in background with nohup; their PIDs are recorded for
+        # monitor_progress and shutdown_instance. Output is captured again:
+        # the setup commands in front can fail.
+        self.run_remote_command(self.in_environment(
+            f"{setup}{self._cd}{{ "
+            f"nohup {self._mon_cmd} > monitor.log 2>&1 < /dev/null & echo $! > monitor.pid; "
+            f"nohup {self._gen_cmd} > generator.log 2>&1 < /dev/null & echo $! > generator.pid; "
+            f"}}"
+        ))
+        
+        logger.info("Resource monitor and generation process started")
     
     def monitor_progress(self) -> bool:
         """
@@ -359,37 +819,53 @@ class VastAIOrchestrator:
         """
         logger.info("Monitoring generation progress...")
         
-        workspace = self.config["remote_workspace"]
-        
+        # One long-lived session: wait_pid.py follows the log and returns as
+        # soon as the kernel reports the generator's exit through a pidfd, so
+        # there is nothing to poll. A reader thread feeds its lines through a
+        # queue so the status updates below keep their cadence whether or
+        # not output arrives.
+        # (inside the container, if any: the recorded PID is in its namespace)
+        command = self.in_environment(
+            f"{self._cd}python3 wait_pid.py $(cat generator.pid) --follow generator.log"
+        )
+        lines = queue.Queue()
+        
+        def read_log():
+            try:
+                for line in self._stream(command):
+                    lines.put(line)
+            finally:
+                lines.put(None)  # EOF: generator exited (or the session dropped)
+        
+        threading.Thread(target=read_log, daemon=True).start()
+        
+        # First line matching ERROR_PATTERN (error records, tracebacks or a
+        # non-zero failure count), not any mention of "error" in the log
+        first_error = None
+        recent = collections.deque(maxlen=5)
+        next_status = time.monotonic() + STATUS_INTERVAL
         while True:
-            # Check if generator is still running
-            result = self.run_remote_command(
-                f"pgrep -f flux_generator.py",
-                check=False
-            )
-            
-            if result.returncode != 0:
-                logger.info("Generator process has completed")
+            try:
+                line = lines.get(timeout=max(0.0, next_status - time.monotonic()))
+            except queue.Empty:
+                if recent:
+                    logger.info("Generator status:\n%s", "\n".join(recent))
+                    recent.clear()
+                next_status = time.monotonic() + STATUS_INTERVAL
+                continue
+            if line is None:
                 break
             
-            # Print status
-            log_result = self.run_remote_command(
-                f"tail -n 5 {workspace}/generator.log",
-                check=False
-            )
-            if log_result.stdout:
-                logger.info(f"Generator status:\n{log_result.stdout}")
-            
-            time.sleep(30)
+            recent.append(line)
+            if first_error is None and ERROR_PATTERN.search(line):
+                first_error = line
         
-        # Check for errors in the log
-        log_result = self.run_remote_command(
-            f"tail -n 50 {workspace}/generator.log",
-            check=False
-        )
+        if recent:
+            logger.info("Generator status:\n%s", "\n".join(recent))
+        logger.info("Generator process has completed")
         
-        if "error" in log_result.stdout.lower() or "failed" in log_result.stdout.lower():
-            logger.warning("Detected errors in generator log")
+        if first_error is not None:
+            logger.warning("Detected errors in generator log, first: %s", first_error.strip())
             return False
         
         return True
@@ -402,11 +878,15 @@ class VastAIOrchestrator:
         
         logger.info("Shutting down Vast.ai instance...")
         
-        # Stop resource monitor
-        self.run_remote_command("pkill -f resource_monitor.py", check=False)
+        # Stop resource monitor, and give it time to write its buffered
+        # samples and final commit before the machine goes down
+        self.run_remote_command(self.in_environment(
+            f"{self._cd}kill $(cat monitor.pid) 2>/dev/null && "
+            f"timeout 120 python3 wait_pid.py $(cat monitor.pid) || pkill -f resource_monitor.py"
+        ), check=False, capture=False)
         
         # Shutdown command
-        self.run_remote_command("shutdown -h now", check=False)
+        self.run_remote_command("shutdown -h now", check=False, capture=False)
         
         logger.info("Shutdown command sent")
     
@@ -428,18 +908,24 @@ class VastAIOrchestrator:
             if not self.check_disk_space():
                 logger.warning("Low disk space detected, but continuing...")
             
-            # Setup
-            self.setup_workspace()
-            self.install_packages()
-            self.setup_git_repo()
+            # Setup: the long pip install overlapped with the uploads (which
+            # create the workspace); directories and git are set up by
+            # start_all in the same call that launches the processes
+            def install_missing():
+                script = self.install_packages()
+                if script:
+                    self._exec_script(script)
             
-            # Upload files
-            self.upload_scripts()
-            self.upload_prompts(prompts_file)
+            logger.info("Installing packages while uploading files...")
+            with ThreadPoolExecutor(max_workers=2) as pool:
+                install = pool.submit(install_missing)
+                upload = pool.submit(self.upload_files, prompts_file)
+                upload.result()
+                install.result()
+            logger.info("Setup complete")
             
             # Start processes
-            self.start_resource_monitor()
-            self.start_generation(prompts_file)
+            self.start_all()
             
             # Monitor
             success = self.monitor_progress()
@@ -457,8 +943,10 @@ class VastAIOrchestrator:
             logger.info("Orchestration complete")
             
         except Exception as e:
-            logger.error(f"Orchestration failed: {e}", exc_info=True)
+            logger.error("Orchestration failed: %s", e, exc_info=True)
             raise
+        finally:
+            self.close()
 
 
 def main():
@@ -482,7 +970,7 @@ def main():
     
     # Validate prompts file exists
     if not os.path.exists(args.prompts_file):
-        logger.error(f"Prompts file not found: {args.prompts_file}")
+        logger.error("Prompts file not found: %s", args.prompts_file)
         sys.exit(1)
     
     # Create orchestrator and run
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Process Exit Waiter for Vast.ai Instances
+
+Blocks until a process exits, optionally copying a log file to stdout while
+it runs. The orchestrator runs this over SSH to follow the generator: the
+exit is delivered by the kernel through a pidfd (Linux 5.3+), so it is seen
+immediately instead of on the next poll, and whatever the process wrote
+last is still printed before this script returns.
+"""
+
+import argparse
+import errno
+import os
+import select
+import sys
+import time
+
+# Seconds between log reads while following
+FOLLOW_INTERVAL = 0.5
+
+
+def open_pidfd(pid: int):
+    """pidfd for pid, None where pidfd_open is unavailable; raises if pid is gone"""
+    try:
+        return os.pidfd_open(pid)
+    except (AttributeError, PermissionError):
+        return None
+    except OSError as e:
+        if e.errno == errno.ENOSYS:  # kernel older than 5.3
+            return None
+        raise
+
+
+def has_exited(pid: int) -> bool:
+    """Fallback check for kernels without pidfd"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        pass
+    return False
+
+
+def wait_for_exit(pid: int, follow: str = None):
+    """
+    Wait for pid to exit
+
+    Args:
+        pid: Process to wait for
+        follow: Log file whose new contents are copied to stdout meanwhile
+    """
+    try:
+        pidfd = open_pidfd(pid)
+    except ProcessLookupError:
+        pidfd = None
+        exited = True
+    else:
+        exited = False
+
+    log = None
+
+    def drain():
+        nonlocal log
+        if follow is None:
+            return
+        if log is None:
+            try:
+                log = open(follow, "rb")
+            except FileNotFoundError:
+                return
+        data = log.read()
+        if data:
+            sys.stdout.buffer.write(data)
+            sys.stdout.buffer.flush()
+
+    # Without a log to follow there is nothing to do but block on the pidfd
+    timeout = FOLLOW_INTERVAL if follow is not None else None
+    while not exited:
+        drain()
+        if pidfd is not None:
+            ready, _, _ = select.select([pidfd], [], [], timeout)
+            exited = bool(ready)
+        else:
+            time.sleep(FOLLOW_INTERVAL)
+            exited = has_exited(pid)
+
+    # Pick up the last lines written before the exit
+    drain()
+
+    if pidfd is not None:
+        os.close(pidfd)
+    if log is not None:
+        log.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Wait for a process to exit, optionally following its log"
+    )
+    parser.add_argument(
+        "pid",
+        type=int,
+        help="Process ID to wait for"
+    )
+    parser.add_argument(
+        "--follow",
+        help="Log file to copy to stdout until the process exits"
+    )
+
+    args = parser.parse_args()
+    wait_for_exit(args.pid, args.follow)
+
+
+if __name__ == "__main__":
+    main()